@@ -1,36 +1,47 @@
 import os
 import json
 import logging
+import sys
 import threading
 import time
 import asyncio
 import csv
 import io
-import random
-import string
-from datetime import datetime, timedelta
-from collections import defaultdict # তারিখ অনুযায়ী ডাটা সাজানোর জন্য
-import requests
+import tempfile
+import secrets
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone, time as dtime
+from collections import defaultdict, OrderedDict # তারিখ অনুযায়ী ডাটা সাজানোর জন্য
+import httpx
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.field_path import FieldPath
 from telegram import (
     Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
 )
 from telegram.constants import ParseMode
 from telegram.error import BadRequest
+from telegram.helpers import escape_markdown
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, ContextTypes, CallbackQueryHandler,
-    MessageHandler, filters, ConversationHandler
+    MessageHandler, filters, ConversationHandler, AIORateLimiter
 )
 from google_play_scraper import Sort, reviews as play_reviews
-from flask import Flask
+
+# stdout এ লগ (কনটেইনারে প্রতিটি print এর বদলে লগিং হ্যান্ডলার দিয়েই লেখা হয়)
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO,
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
 
 # --- AI Import Safeguard ---
 try:
     import google.generativeai as genai
     AI_AVAILABLE = True
 except Exception as e:
-    print(f"⚠️ Google AI Library Error (Skipping AI features): {e}")
+    logger.warning(f"⚠️ Google AI Library Error (Skipping AI features): {e}")
     AI_AVAILABLE = False
     genai = None
 
@@ -38,12 +49,6 @@ except Exception as e:
 # 1. কনফিগারেশন এবং সেটআপ
 # ==========================================
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
 # ENV ভেরিয়েবল
 TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
 OWNER_ID = os.environ.get("OWNER_ID", "") 
@@ -52,14 +57,29 @@ GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', "")
 IMGBB_API_KEY = os.environ.get('IMGBB_API_KEY', "")
 PORT = int(os.environ.get("PORT", 8080))
 
-# Gemini AI সেটআপ (অপশনাল)
-model = None
-if AI_AVAILABLE and GEMINI_API_KEY:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-    except Exception as e:
-        logger.error(f"Gemini AI Config Error: {e}")
+# Gemini AI সেটআপ (অপশনাল) - প্রথম ব্যবহারে তৈরি হয়, স্টার্টআপে নয়
+AI_ENABLED = AI_AVAILABLE and bool(GEMINI_API_KEY)
+_model = None
+_MODEL_LOCK = threading.Lock()
+
+def get_model():
+    global _model, AI_ENABLED
+    if _model is None and AI_ENABLED:
+        with _MODEL_LOCK:
+            if _model is None and AI_ENABLED:
+                try:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                    _model = genai.GenerativeModel('gemini-1.5-flash')
+                except Exception as e:
+                    logger.error(f"Gemini AI Config Error: {e}")
+                    AI_ENABLED = False # বারবার চেষ্টা না করে AI বন্ধ
+    return _model
+
+# AI সামারি বটের লুপে async কল (থ্রেড নয়); একসাথে সর্বোচ্চ ৫টি Gemini রিকোয়েস্ট
+AI_SEM = asyncio.Semaphore(5)
+AI_MIN_CHARS = 10 # এর চেয়ে ছোট রিভিউতে মুড বোঝা যায় না, AI কল হয় না
+AI_CACHE_CAP = 1024
+_AI_CACHE = OrderedDict() # (text, rating) -> মুড; কপি-পেস্ট রিভিউতে আবার বিল হওয়া Gemini কল নয়
 
 # Firebase কানেকশন
 if not firebase_admin._apps:
@@ -71,12 +91,19 @@ if not firebase_admin._apps:
         else:
             cred = credentials.Certificate(FIREBASE_JSON)
         firebase_admin.initialize_app(cred)
-        print("✅ Firebase Connected Successfully!")
+        logger.info("✅ Firebase Connected Successfully!")
     except Exception as e:
-        print(f"❌ Firebase Connection Failed: {e}")
+        logger.error(f"❌ Firebase Connection Failed: {e}")
 
 db = firestore.client()
 
+# অটোমেশন থ্রেড থেকে মেসেজ পাঠাতে বটের নিজের লুপ (post_init এ সেট হয়)
+BOT_APP = None
+BOT_LOOP = None
+LOG_QUEUE = None # লগ চ্যানেলের মেসেজ কিউ (post_init এ তৈরি, একটি worker পাঠায়)
+LOG_QUEUE_MAX = 512
+LOG_CHANNEL_ID = OWNER_ID # কনফিগ লোড/আপডেটে _prepare_config সেট করে; লগ পাঠাতে কনফিগ লাগে না
+
 # ==========================================
 # 2. গ্লোবাল কনফিগারেশন ও স্টেট
 # ==========================================
@@ -101,6 +128,30 @@ DEFAULT_CONFIG = {
     "custom_buttons": [] 
 }
 
+# get_config() এর ইন-মেমোরি ক্যাশ (সেকেন্ড)
+CFG_TTL = 30
+CFG_LIVE_TTL = 300 # লিসেনার চালু থাকলেও এই সময় পর রিলোড (Watch স্ট্রিম চুপচাপ বন্ধ হলে কনফিগ আটকে থাকে না)
+_CFG_CACHE = None
+_CFG_TS = 0.0
+_CFG_LOCK = threading.Lock()
+_CFG_LIVE = False # on_snapshot লিসেনার প্রথম স্ন্যাপশট দিলে True
+_CFG_INFLIGHT = None # চলমান লোডের Future; একসাথে অনেকে চাইলে Firestore রিড একটাই
+
+# সম্প্রতি দেখা Play Store রিভিউ আইডি (LRU), যাতে প্রতি সাইকেলে Firestore চেক না লাগে
+SEEN_REVIEW_CAP = 5000
+SEEN_REVIEW_IDS = OrderedDict()
+_SEEN_LOCK = threading.Lock() # অ্যাপগুলো প্যারালাল থ্রেডে চেক হয়
+
+# is_admin() ফলাফলের ক্যাশ: {user_id: (is_admin, timestamp)}
+ADMIN_TTL = 300
+_ADMIN_CACHE = {}
+# is_admin == True ইউজারদের আইডি; Firestore লিসেনার (on_snapshot) সবসময় আপডেট রাখে
+_ADMIN_IDS = None
+
+# এই প্রসেসে যেসব ইউজারের ডকুমেন্ট আছে বলে নিশ্চিত (create_user রিড এড়াতে)
+KNOWN_USERS_CAP = 20000
+_KNOWN_USERS = set()
+
 # Conversation States (Bot side interactions)
 (
     T_APP_SELECT, T_REVIEW_NAME, T_EMAIL, T_DEVICE, T_SS,           
@@ -118,146 +169,399 @@ DEFAULT_CONFIG = {
     REMOVE_CUS_BTN                                                  
 ) = range(29)
 
+# কনভারসেশনের টেক্সট স্টেপগুলোর জন্য একটাই ফিল্টার (কমান্ড বাদে)
+TEXT_NC = filters.TEXT & ~filters.COMMAND
+TEXT_PHOTO_NC = (filters.TEXT | filters.PHOTO) & ~filters.COMMAND
+
+# স্থির কিবোর্ড একবারই তৈরি (প্রতি কলব্যাকে নতুন অবজেক্ট নয়; PTB অবজেক্টগুলো immutable)
+BACK_KB = InlineKeyboardMarkup([[InlineKeyboardButton("🔙", callback_data="back_home")]])
+BACK_HOME_KB = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]])
+ADMIN_HOME_BTN = InlineKeyboardButton("⚙️ এডমিন প্যানেল", callback_data="admin_panel")
+REFRESH_BTN = InlineKeyboardButton("🔄 রিফ্রেশ", callback_data="back_home")
+BACK_ADMIN_KB = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]])
+ADMIN_PANEL_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("👥 Users & Balance", callback_data="adm_users"), InlineKeyboardButton("💰 Finance & Liability", callback_data="adm_finance")],
+    [InlineKeyboardButton("📱 Apps Manage", callback_data="adm_apps"), InlineKeyboardButton("👮 Manage Admins", callback_data="adm_admins")],
+    [InlineKeyboardButton("🎨 Buttons & Time", callback_data="adm_content"), InlineKeyboardButton("📢 Log Channel", callback_data="adm_log")],
+    [InlineKeyboardButton("📊 Reports & Stats", callback_data="adm_reports")],
+    [InlineKeyboardButton("🔙 Back to User Mode", callback_data="back_home")]
+])
+ADMIN_HOME_ROW = (InlineKeyboardButton("🔙 Admin Home", callback_data="admin_panel"),)
+ADMIN_BACK_ROW = (InlineKeyboardButton("🔙 Back", callback_data="admin_panel"),)
+ADM_USERS_KB = InlineKeyboardMarkup([[InlineKeyboardButton("🔍 Manage Specific User", callback_data="find_user")], ADMIN_HOME_ROW])
+ADM_FINANCE_KB = InlineKeyboardMarkup([[InlineKeyboardButton("✏️ Change Ref Bonus", callback_data="ed_txt_referral_bonus")], ADMIN_HOME_ROW])
+ADM_APPS_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("➕ Add App", callback_data="add_app"), InlineKeyboardButton("➖ Remove App", callback_data="rmv_app")],
+    [InlineKeyboardButton("✏️ Edit Limit", callback_data="edit_app_limit_start")],
+    ADMIN_HOME_ROW
+])
+ADM_CONTENT_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("⏰ Start Time", callback_data="set_time_start"), InlineKeyboardButton("⏰ End Time", callback_data="set_time_end")],
+    [InlineKeyboardButton("🔘 Button Config", callback_data="ed_btns")],
+    [InlineKeyboardButton("➕ Add Custom Btn", callback_data="add_cus_btn"), InlineKeyboardButton("➖ Rmv Custom Btn", callback_data="rmv_cus_btn")],
+    ADMIN_HOME_ROW
+])
+ADM_ADMINS_KB = InlineKeyboardMarkup([[InlineKeyboardButton("➕ Add Admin", callback_data="add_new_admin")], [InlineKeyboardButton("➖ Remove Admin", callback_data="rmv_admin_role")], ADMIN_BACK_ROW])
+ADM_LOG_KB = InlineKeyboardMarkup([[InlineKeyboardButton("✏️ Set Channel ID", callback_data="set_log_id")], ADMIN_BACK_ROW])
+# রিপোর্ট মেনুর শেষের স্থির সারিগুলো (অ্যাপের সারিগুলোর পরে জোড়া হয়)
+REPORTS_TAIL_ROWS = ((InlineKeyboardButton("📊 Daily Approved Stats (Last 7 Days)", callback_data="adm_daily_stats"),), ADMIN_BACK_ROW)
+BACK_REPORTS_KB = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back", callback_data="adm_reports")]])
+WD_METHOD_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Bkash", callback_data="m_bkash"), InlineKeyboardButton("Nagad", callback_data="m_nagad")],
+    [InlineKeyboardButton("❌ বাতিল", callback_data="cancel")]
+])
+
 # ==========================================
 # 3. হেল্পার ফাংশন
 # ==========================================
 
-def get_config():
+def parse_hhmm(value):
+    """'HH:MM' স্ট্রিং থেকে time অবজেক্ট (strptime এর চেয়ে অনেক দ্রুত)"""
+    hour, minute = value.split(":")
+    return dtime(int(hour), int(minute))
+
+def _prepare_config(data):
+    """কনফিগ লোড হওয়ার পর কাজের সময় একবার পার্স করে রাখা হচ্ছে"""
+    global LOG_CHANNEL_ID
+    # খালি থাকলে মালিকের কাছে লগ যায়
+    LOG_CHANNEL_ID = data.get('log_channel_id') or OWNER_ID
+    for prefix, field in (("_start", "work_start_time"), ("_end", "work_end_time")):
+        raw = data.get(field) or DEFAULT_CONFIG[field]
+        try:
+            t = parse_hhmm(raw)
+            data[prefix + "_t"], data[prefix + "_disp"] = t, t.strftime("%I:%M %p")
+        except ValueError:
+            data[prefix + "_t"], data[prefix + "_disp"] = None, raw
+    # অ্যাপ আইডি দিয়ে O(1) লুকআপের জন্য ইনডেক্স
+    data['_apps_by_id'] = {a['id']: a for a in data.get('monitored_apps', [])}
+    # হোম মেসেজের নাম-বাদে বাকি অংশ (প্রতি /start এ শুধু নাম বসানো হয়)
+    data['_welcome_tail'] = (
+        "! 🌙\n\n"
+        f"🗒 **কাজের নিয়মাবলী:**\n{data.get('rules_text', '')}\n\n"
+        "🔑 **অ্যাপে লগইন:** অ্যাপ বা ওয়েবসাইটে লগইন করার জন্য `/login` কমান্ডটি ব্যবহার করুন।"
+    )
+    return data
+
+def _config_from_doc(data):
+    # ডিফল্ট ভ্যালু মার্জ করা হচ্ছে যাতে এরর না আসে (এক ধাপে dict মার্জ, পাইথন লুপ নয়)
+    return _prepare_config({**DEFAULT_CONFIG, **data})
+
+def _load_config():
     try:
         ref = db.collection('settings').document('main_config')
         doc = ref.get()
         if doc.exists:
-            data = doc.to_dict()
-            # ডিফল্ট ভ্যালু মার্জ করা হচ্ছে যাতে এরর না আসে
-            for key, val in DEFAULT_CONFIG.items():
-                if key not in data:
-                    data[key] = val
-            return data
+            return _config_from_doc(doc.to_dict())
         else:
             ref.set(DEFAULT_CONFIG)
-            return DEFAULT_CONFIG
+            return _prepare_config(dict(DEFAULT_CONFIG))
     except:
-        return DEFAULT_CONFIG
+        return None
+
+def get_config():
+    """কনফিগ CFG_TTL সেকেন্ড পর্যন্ত মেমোরি থেকে দেওয়া হয় (প্রতি কলে Firestore রিড নয়)"""
+    global _CFG_CACHE, _CFG_TS, _CFG_INFLIGHT
+    with _CFG_LOCK:
+        # লিসেনার চালু থাকলে লম্বা TTL (ব্যাকস্টপ); invalidate_config() দুই ক্ষেত্রেই রিলোড করায়
+        if _CFG_CACHE is not None and time.monotonic() - _CFG_TS < (CFG_LIVE_TTL if _CFG_LIVE else CFG_TTL):
+            return _CFG_CACHE
+        # অন্য থ্রেড আগেই লোড শুরু করলে সেটার ফলাফলের জন্য অপেক্ষা
+        fut, leader = _CFG_INFLIGHT, _CFG_INFLIGHT is None
+        if leader:
+            fut = _CFG_INFLIGHT = Future()
+    if not leader:
+        return fut.result()
+
+    try:
+        data = _load_config()
+        with _CFG_LOCK:
+            if data is None:
+                # Firestore এরর হলে আগের কপি (থাকলে) অথবা ডিফল্ট
+                data = _CFG_CACHE if _CFG_CACHE is not None else _prepare_config(dict(DEFAULT_CONFIG))
+            else:
+                _CFG_CACHE, _CFG_TS = data, time.monotonic()
+            _CFG_INFLIGHT = None
+    except Exception as e:
+        with _CFG_LOCK:
+            _CFG_INFLIGHT = None
+        fut.set_exception(e)
+        raise
+    fut.set_result(data)
+    return data
 
 def update_config(data):
     try:
         db.collection('settings').document('main_config').set(data, merge=True)
     except Exception as e:
         logger.error(f"Config Update Error: {e}")
+        invalidate_config()
+        return
+
+    _merge_cached_config(data)
+
+def _on_config_snapshot(docs, changes, read_time):
+    global _CFG_CACHE, _CFG_TS, _CFG_LIVE
+    if not docs or not docs[0].exists: return
+    data = _config_from_doc(docs[0].to_dict())
+    with _CFG_LOCK:
+        _CFG_CACHE, _CFG_TS, _CFG_LIVE = data, time.monotonic(), True
+
+def watch_config():
+    """কনফিগ ডকুমেন্টের লাইভ মিরর; এডমিন প্যানেল বা ওয়েব থেকে বদলালে সাথে সাথে আপডেট হয়"""
+    try:
+        return db.collection('settings').document('main_config').on_snapshot(_on_config_snapshot)
+    except Exception as e:
+        logger.error(f"Config Watch Error: {e}")
+        return None
+
+def update_config_array(field, op):
+    """ArrayUnion/ArrayRemove দিয়ে লিস্টের শুধু পরিবর্তনটুকু লেখা; ফলাফল জানা নেই বলে ক্যাশ বাতিল"""
+    try:
+        db.collection('settings').document('main_config').update({field: op})
+    except Exception as e:
+        logger.error(f"Config Update Error: {e}")
+    invalidate_config()
+
+def invalidate_config():
+    """পরের get_config() এ Firestore থেকে নতুন করে লোড হবে (লিসেনার চালু থাকলে স্ন্যাপশটই ক্যাশ আপডেট করে)"""
+    global _CFG_TS
+    with _CFG_LOCK:
+        _CFG_TS = float("-inf") # monotonic ঘড়ি বুটের পর ছোট থাকতে পারে, তাই 0 নয়
+
+def _merge_cached_config(data):
+    """লেখা সফল হলে প্যাচটি ক্যাশেই মার্জ (আবার Firestore রিড লাগে না); _ দিয়ে শুরু হওয়া কী গুলো নতুন করে তৈরি হবে"""
+    global _CFG_CACHE, _CFG_TS
+    with _CFG_LOCK:
+        if _CFG_CACHE is not None:
+            merged = {k: v for k, v in _CFG_CACHE.items() if not k.startswith('_')}
+            merged.update(data)
+            _CFG_CACHE, _CFG_TS = _prepare_config(merged), time.monotonic()
+
+BD_TZ = timezone(timedelta(hours=6)) # বাংলাদেশ (UTC+6, DST নেই)
 
 def get_bd_time():
     """Returns current time in Bangladesh (UTC+6)"""
-    return datetime.utcnow() + timedelta(hours=6)
+    return datetime.now(BD_TZ)
 
 def is_working_hour():
     config = get_config()
-    start_str = config.get("work_start_time", "15:30")
-    end_str = config.get("work_end_time", "23:00")
-    try:
-        now = get_bd_time().time()
-        start = datetime.strptime(start_str, "%H:%M").time()
-        end = datetime.strptime(end_str, "%H:%M").time()
-        
-        if start < end:
-            return start <= now <= end
-        else: # মধ্যরাত ক্রস করলে
-            return now >= start or now <= end
-    except Exception as e:
-        return True 
+    start, end = config.get("_start_t"), config.get("_end_t")
+    if start is None or end is None:
+        return True
+
+    now = get_bd_time().time()
+    if start < end:
+        return start <= now <= end
+    else: # মধ্যরাত ক্রস করলে
+        return now >= start or now <= end
 
 def is_admin(user_id):
     if str(user_id) == str(OWNER_ID): return True
+    key = str(user_id)
+    admin_ids = _ADMIN_IDS
+    if admin_ids is not None: return key in admin_ids
+    # লিসেনার চালু না হওয়া পর্যন্ত পুরনো TTL ক্যাশ + রিড
+    cached = _ADMIN_CACHE.get(key)
+    if cached and time.monotonic() - cached[1] < ADMIN_TTL:
+        return cached[0]
     try:
-        user = db.collection('users').document(str(user_id)).get()
-        return user.exists and user.to_dict().get('is_admin', False)
+        user = db.collection('users').document(key).get(field_paths=['is_admin']) # শুধু দরকারি ফিল্ড
+        result = user.exists and user.to_dict().get('is_admin', False)
     except: return False
+    _ADMIN_CACHE[key] = (result, time.monotonic())
+    return result
+
+def set_admin_flag(user_id, flag):
+    """এডমিন যোগ/বাদের পর লোকাল সেট সাথে সাথে আপডেট (লিসেনারের জন্য অপেক্ষা না করে)"""
+    global _ADMIN_IDS
+    key = str(user_id)
+    _ADMIN_CACHE.pop(key, None)
+    if _ADMIN_IDS is not None:
+        _ADMIN_IDS = _ADMIN_IDS | {key} if flag else _ADMIN_IDS - {key}
+
+def _on_admins_snapshot(docs, changes, read_time):
+    global _ADMIN_IDS
+    _ADMIN_IDS = frozenset(d.id for d in docs)
+
+def refresh_admins():
+    """লিসেনার চালু করা না গেলে একবারে পুরো এডমিন সেট লোড (একটি কুয়েরি, প্রতি ইউজারে রিড নয়)"""
+    global _ADMIN_IDS
+    try:
+        _ADMIN_IDS = frozenset(d.id for d in db.collection('users').where('is_admin', '==', True).select([FieldPath.document_id()]).stream())
+    except Exception as e:
+        logger.error(f"Admin Refresh Error: {e}")
+
+def watch_admins():
+    """এডমিন তালিকা মেমোরিতে রাখা; প্রতি এডমিন ক্লিকে Firestore রিড লাগে না"""
+    try:
+        return db.collection('users').where('is_admin', '==', True).on_snapshot(_on_admins_snapshot)
+    except Exception as e:
+        logger.error(f"Admin Watch Error: {e}")
+        return None
 
-def get_user(user_id):
+def get_user(user_id, fields=None):
+    """fields দিলে শুধু সেই ফিল্ডগুলো আনা হয় (পুরো ডকুমেন্ট না)"""
     try:
-        doc = db.collection('users').document(str(user_id)).get()
+        doc = db.collection('users').document(str(user_id)).get(field_paths=fields)
         if doc.exists: return doc.to_dict()
     except: pass
     return None
 
+@firestore.transactional
+def _create_user_tx(transaction, user_ref, user_data, referrer_ref, bonus):
+    """নতুন ইউজার তৈরি + রেফার বোনাস atomic ভাবে (একসাথে দুটি /start এ ডাবল বোনাস হবে না)"""
+    snap = user_ref.get(transaction=transaction)
+    if snap.exists: return snap.to_dict()
+
+    # ট্রানজ্যাকশনে সব রিড আগে, তারপর রাইট
+    referrer_exists = referrer_ref is not None and referrer_ref.get(transaction=transaction).exists
+    transaction.set(user_ref, user_data)
+
+    # [UPDATE] রেফার বোনাস + কাউন্ট আপডেট
+    if referrer_exists and bonus > 0:
+        transaction.update(referrer_ref, {
+            "balance": firestore.Increment(bonus),
+            "referral_count": firestore.Increment(1) # রেফারকারীর কাউন্ট বাড়ছে
+        })
+    return user_data
+
 def create_user(user_id, first_name, referrer_id=None):
-    if not get_user(user_id):
+    """ইউজার না থাকলে তৈরি করে; ব্লক চেকের জন্য ইউজারের ডাটা রিটার্ন করে (পুরনো ইউজারে শুধু is_blocked)"""
+    # পুরনো ইউজারের জন্য একটাই ছোট রিড (হট পাথ); ট্রানজ্যাকশন শুধু নতুন ইউজারে
+    try:
+        snap = db.collection('users').document(str(user_id)).get(field_paths=['is_blocked'])
+        db_user = (snap.to_dict() or {}) if snap.exists else None
+    except: db_user = None
+    if db_user is None:
         try:
+            valid_referrer = referrer_id and referrer_id.isdigit() and str(referrer_id) != str(user_id)
             user_data = {
                 "id": str(user_id),
                 "name": first_name,
                 "balance": 0.0,
                 "total_tasks": 0,
                 "referral_count": 0, # [UPDATE] রেফার সংখ্যা ট্র্যাক করার জন্য
-                "joined_at": datetime.now(),
-                "referrer": referrer_id if referrer_id and referrer_id.isdigit() and str(referrer_id) != str(user_id) else None,
+                "joined_at": firestore.SERVER_TIMESTAMP,
+                "referrer": referrer_id if valid_referrer else None,
                 "is_blocked": False,
                 "is_admin": str(user_id) == str(OWNER_ID),
                 "web_password": "",  
                 "device_id": ""      
             }
-            db.collection('users').document(str(user_id)).set(user_data)
-            
-            # [UPDATE] রেফার বোনাস + কাউন্ট আপডেট
-            if referrer_id and referrer_id.isdigit() and str(referrer_id) != str(user_id):
-                 config = get_config()
-                 bonus = config.get('referral_bonus', 0.0)
-                 if bonus > 0:
-                     db.collection('users').document(str(referrer_id)).update({
-                         "balance": firestore.Increment(bonus),
-                         "referral_count": firestore.Increment(1) # রেফারকারীর কাউন্ট বাড়ছে
-                     })
+            referrer_ref = db.collection('users').document(str(referrer_id)) if valid_referrer else None
+            bonus = get_config().get('referral_bonus', 0.0)
+            db_user = _create_user_tx(db.transaction(), db.collection('users').document(str(user_id)), user_data, referrer_ref, bonus)
         except: pass
+    if db_user is not None: remember_user(user_id)
+    return db_user
+
+def remember_user(user_id):
+    if len(_KNOWN_USERS) >= KNOWN_USERS_CAP: _KNOWN_USERS.clear()
+    _KNOWN_USERS.add(str(user_id))
+
+async def send_log_message(context, text, reply_markup=None, photo=None):
+    """লগ কিউতে রেখে সাথে সাথে ফেরত (হ্যান্ডলার টেলিগ্রামের উত্তরের জন্য অপেক্ষা করে না)"""
+    item = (text, reply_markup, photo)
+    if LOG_QUEUE is None:
+        return await _deliver_log(context.bot, item)
+    try:
+        LOG_QUEUE.put_nowait(item)
+    except asyncio.QueueFull:
+        logger.warning("Log queue full, dropping log message")
 
-async def send_log_message(context, text, reply_markup=None):
-    config = get_config()
-    chat_id = config.get('log_channel_id')
-    target_id = chat_id if chat_id else OWNER_ID
+async def _deliver_log(bot, item):
+    text, reply_markup, photo = item
+    target_id = LOG_CHANNEL_ID
     if target_id:
         try:
-            await context.bot.send_message(chat_id=target_id, text=text, reply_markup=reply_markup, parse_mode="Markdown")
-        except: pass
+            if photo:
+                # টেলিগ্রামে থাকা ছবিটাই file_id দিয়ে পাঠানো হচ্ছে (রি-আপলোড ছাড়া)
+                await bot.send_photo(chat_id=target_id, photo=photo, caption=text, reply_markup=reply_markup, parse_mode="Markdown")
+            else:
+                await bot.send_message(chat_id=target_id, text=text, reply_markup=reply_markup, parse_mode="Markdown")
+        except Exception as e:
+            logger.error(f"Log Send Error: {e}")
 
-def get_ai_summary(text, rating):
+async def log_worker(bot):
+    """কিউ থেকে একটা একটা করে লগ পাঠায় (প্রতিটি লগের নিজস্ব বাটন থাকায় একত্র করা যায় না)"""
+    while True:
+        item = await LOG_QUEUE.get()
+        try:
+            await _deliver_log(bot, item)
+        finally:
+            LOG_QUEUE.task_done()
+
+async def edit_log_message(query, text):
+    """লগ মেসেজ এডিট (ছবিসহ লগ হলে ক্যাপশন এডিট করতে হয়)"""
+    if query.message and query.message.photo:
+        await query.edit_message_caption(caption=text, parse_mode="Markdown")
+    else:
+        await query.edit_message_text(text, parse_mode="Markdown")
+
+def md(value):
+    """ইউজারের দেওয়া লেখা Markdown মেসেজে বসানোর আগে এস্কেপ (নাম/নাম্বারে _ * ` [ থাকলে মেসেজ ফেল করে)"""
+    return escape_markdown(str(value), version=1)
+
+def proof_link(value):
+    """স্ক্রিনশট লিংক: http(s) হলে Markdown লিংক, নাহলে এস্কেপ করা লেখা (ভুল লিংকে লগ মেসেজ ফেল না করে)"""
+    value = str(value or '').strip()
+    if value.startswith(("http://", "https://")):
+        return f"[View Screenshot]({value.replace(')', '%29')})"
+    return md(value)
+
+async def get_ai_summary(text, rating):
+    if not text or len(text.strip()) < AI_MIN_CHARS: return "N/A"
+    key = (text, rating)
+    if key in _AI_CACHE:
+        _AI_CACHE.move_to_end(key)
+        return _AI_CACHE[key]
+    model = get_model()
     if not model: return "N/A"
     try:
         prompt = f"Review: '{text}' ({rating}/5). Summarize sentiment in Bangla (max 10 words). Start with 'মুড:'"
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        async with AI_SEM:
+            response = await model.generate_content_async(prompt)
+        mood = response.text.strip()
     except: return "N/A"
+    # শুধু বটের লুপ থেকে কল হয়, তাই লক লাগে না
+    _AI_CACHE[key] = mood
+    if len(_AI_CACHE) > AI_CACHE_CAP: _AI_CACHE.popitem(last=False)
+    return mood
 
 def get_app_task_count(app_id):
     try:
-        pending = db.collection('tasks').where('app_id', '==', app_id).where('status', '==', 'pending').stream()
-        approved = db.collection('tasks').where('app_id', '==', app_id).where('status', '==', 'approved').stream()
-        count = len(list(pending)) + len(list(approved))
-        return count
-    except:
+        # সার্ভার-সাইড count() অ্যাগ্রিগেশন: ডকুমেন্ট ডাউনলোড না করে শুধু সংখ্যা আসে
+        # pending + approved একটি 'in' কুয়েরিতে (স্ট্যাটাস প্রতি আলাদা কুয়েরি নয়)
+        query = db.collection('tasks').where('app_id', '==', app_id).where('status', 'in', ['pending', 'approved'])
+        return int(query.count().get()[0][0].value)
+    except Exception as e:
+        logger.error(f"Task Count Error ({app_id}): {e}")
         return 0
 
 # ==========================================
 # 4. ইউজার সাইড ফাংশন (Bot Interactions)
 # ==========================================
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user
-    args = context.args
-    referrer = args[0] if args and args[0].isdigit() else None
-    create_user(user.id, user.first_name, referrer)
-    
-    db_user = get_user(user.id)
-    if db_user and db_user.get('is_blocked'):
-        await update.message.reply_text("⛔ আপনাকে ব্লক করা হয়েছে।")
-        return
+WELCOME_HEAD = "আসসালামু আলাইকুম, "
 
+def _render_home(user_id, first_name):
+    """হোম মেনুর মেসেজ ও কিবোর্ড তৈরি (start এবং back_home দুটোই এটা ব্যবহার করে)"""
     config = get_config()
-    btns_conf = config.get('buttons', DEFAULT_CONFIG['buttons'])
     
-    welcome_msg = (
-        f"আসসালামু আলাইকুম, {user.first_name}! 🌙\n\n"
-        f"🗒 **কাজের নিয়মাবলী:**\n{config.get('rules_text', '')}\n\n"
-        "🔑 **অ্যাপে লগইন:** অ্যাপ বা ওয়েবসাইটে লগইন করার জন্য `/login` কমান্ডটি ব্যবহার করুন।"
-    )
-
+    # rules_text টেমপ্লেটে সরাসরি জোড়া, তাই .format() নয় (রুলসে { } থাকলেও সমস্যা নেই)
+    welcome_msg = WELCOME_HEAD + md(first_name) + config['_welcome_tail']
+
+    # কিবোর্ড শুধু কনফিগের উপর নির্ভর করে; তাই কনফিগ অবজেক্টের সাথেই ক্যাশ (রিলোডে নিজে থেকেই বাতিল)
+    kb_cache = config.get('_home_kb')
+    if kb_cache is None:
+        # দুটো ভার্সন একসাথে: এডমিনেরটা ইউজারের বাটনগুলোই + শুধু এডমিন সারি (বাটন দুবার তৈরি হয় না)
+        user_kb = _build_home_keyboard(config)
+        admin_kb = InlineKeyboardMarkup(user_kb.inline_keyboard + ((ADMIN_HOME_BTN,),))
+        kb_cache = config['_home_kb'] = {False: user_kb, True: admin_kb}
+    return welcome_msg, kb_cache[bool(is_admin(user_id))]
+
+def _build_home_keyboard(config):
+    btns_conf = config.get('buttons', DEFAULT_CONFIG['buttons'])
     keyboard = []
     row1 = []
     if btns_conf['submit']['show']: row1.append(InlineKeyboardButton(btns_conf['submit']['text'], callback_data="submit_task"))
@@ -270,41 +574,49 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if row2: keyboard.append(row2)
 
     row3 = []
-    if btns_conf.get('schedule', {}).get('show', True): row3.append(InlineKeyboardButton(btns_conf.get('schedule', {}).get('text', "📅 সময়সূচী"), callback_data="show_schedule"))
-    row3.append(InlineKeyboardButton("🔄 রিফ্রেশ", callback_data="back_home"))
-    if row3: keyboard.append(row3)
+    sched = btns_conf.get('schedule', {})
+    if sched.get('show', True): row3.append(InlineKeyboardButton(sched.get('text', "📅 সময়সূচী"), callback_data="show_schedule"))
+    row3.append(REFRESH_BTN) # টেক্সট কনফিগে নেই, তাই সবার জন্য একটাই অবজেক্ট
+    keyboard.append(row3)
 
     custom_btns = config.get('custom_buttons', [])
     for btn in custom_btns:
         if btn.get('text') and btn.get('url'):
             keyboard.append([InlineKeyboardButton(btn['text'], url=btn['url'])])
 
-    if is_admin(user.id):
-        keyboard.append([InlineKeyboardButton("⚙️ এডমিন প্যানেল", callback_data="admin_panel")])
+    return InlineKeyboardMarkup(keyboard)
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    if update.callback_query:
-        try:
-            await update.callback_query.edit_message_text(welcome_msg, reply_markup=reply_markup, parse_mode="Markdown")
-        except BadRequest:
-            pass
-    else:
-        await update.message.reply_text(welcome_msg, reply_markup=reply_markup, parse_mode="Markdown")
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user = update.effective_user
+    args = context.args
+    referrer = args[0] if args and args[0].isdigit() else None
+    # ইউজার রিড/তৈরি আর মেনু (কনফিগ + এডমিন চেক) একসাথে থ্রেডে; লুপ ব্লক হয় না, সময় লাগে দুটোর মধ্যে বেশিটা
+    db_user, (welcome_msg, reply_markup) = await asyncio.gather(
+        asyncio.to_thread(create_user, user.id, user.first_name, referrer),
+        asyncio.to_thread(_render_home, user.id, user.first_name)
+    )
+    if db_user and db_user.get('is_blocked'):
+        await update.message.reply_text("⛔ আপনাকে ব্লক করা হয়েছে।")
+        return
+
+    await update.message.reply_text(welcome_msg, reply_markup=reply_markup, parse_mode="Markdown")
 
 # --- SECURE LOGIN HANDLER (WEB APP OTP) ---
 async def generate_login_pass(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    create_user(user_id, update.effective_user.first_name)
+    # এই প্রসেসে আগে দেখা ইউজার হলে অস্তিত্ব চেকের রিড লাগে না
+    if user_id not in _KNOWN_USERS:
+        await asyncio.to_thread(create_user, user_id, update.effective_user.first_name)
     
     # 6 ডিজিটের র‍্যান্ডম কোড তৈরি (OTP)
-    code = ''.join(random.choices(string.digits, k=6))
+    # secrets: OS এর ক্রিপ্টো-র‍্যান্ডম (random মডিউলের Mersenne Twister অনুমানযোগ্য), একটি কলেই পুরো কোড
+    code = f"{secrets.randbelow(10**6):06d}"
     
     try:
         # ডাটাবেসে কোড সেভ করা হচ্ছে
-        db.collection('users').document(user_id).update({
+        await asyncio.to_thread(db.collection('users').document(user_id).update, {
             "web_password": code,
-            "pass_generated_at": datetime.now()
+            "pass_generated_at": firestore.SERVER_TIMESTAMP
         })
         
         msg = (
@@ -323,10 +635,12 @@ async def common_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         if query.data == "back_home":
-            await start(update, context)
+            # রিফ্রেশে ইউজার তৈরি/ব্লক চেক আবার চালানো হয় না, শুধু মেনু রেন্ডার
+            welcome_msg, reply_markup = _render_home(query.from_user.id, query.from_user.first_name)
+            await query.edit_message_text(welcome_msg, reply_markup=reply_markup, parse_mode="Markdown")
             
         elif query.data == "my_profile":
-            user = get_user(query.from_user.id)
+            user = await asyncio.to_thread(get_user, query.from_user.id)
             if user:
                 # [UPDATE] রেফার কাউন্ট দেখানো হচ্ছে
                 ref_count = user.get('referral_count', 0)
@@ -337,19 +651,19 @@ async def common_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                        f"✅ সম্পন্ন টাস্ক: {user['total_tasks']}")
             else:
                 msg = "👤 **প্রোফাইল**\n\nডেটা লোড করা যায়নি। আবার /start দিন।"
-            await query.edit_message_text(msg, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙", callback_data="back_home")]]))
+            await query.edit_message_text(msg, parse_mode="Markdown", reply_markup=BACK_KB)
             
         elif query.data == "refer_friend":
             config = get_config()
             link = f"https://t.me/{context.bot.username}?start={query.from_user.id}"
-            await query.edit_message_text(f"📢 **রেফার লিংক:**\n`{link}`\n\nপ্রতি রেফারে বোনাস: ৳{config['referral_bonus']}", parse_mode="Markdown", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙", callback_data="back_home")]]))
+            await query.edit_message_text(f"📢 **রেফার লিংক:**\n`{link}`\n\nপ্রতি রেফারে বোনাস: ৳{config['referral_bonus']}", parse_mode="Markdown", reply_markup=BACK_KB)
         
         elif query.data == "show_schedule":
             config = get_config()
-            s_time = datetime.strptime(config.get('work_start_time', '15:30'), "%H:%M").strftime("%I:%M %p")
-            e_time = datetime.strptime(config.get('work_end_time', '23:00'), "%H:%M").strftime("%I:%M %p")
+            s_time = config['_start_disp']
+            e_time = config['_end_disp']
             msg = f"📅 **সময়সূচী:**\n{config.get('schedule_text', '')}\n\n🕒 শুরু: `{s_time}`\nশেষ: `{e_time}`"
-            await query.edit_message_text(msg, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙", callback_data="back_home")]]))
+            await query.edit_message_text(msg, parse_mode="Markdown", reply_markup=BACK_KB)
     except BadRequest: pass
 
 # --- Withdrawal System (Bot Side) ---
@@ -358,18 +672,15 @@ async def withdraw_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     
-    user = get_user(query.from_user.id)
+    user = await asyncio.to_thread(get_user, query.from_user.id, fields=['balance'])
     config = get_config()
     
     if user['balance'] < config['min_withdraw']:
         await query.edit_message_text(f"❌ উইথড্র বাতিল। সর্বনিম্ন উইথড্র অ্যামাউন্ট: ৳{config['min_withdraw']:.2f}", 
-                                      reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙", callback_data="back_home")]]))
+                                      reply_markup=BACK_KB)
         return ConversationHandler.END
         
-    await query.edit_message_text("পেমেন্ট মেথড সিলেক্ট করুন:", reply_markup=InlineKeyboardMarkup([
-        [InlineKeyboardButton("Bkash", callback_data="m_bkash"), InlineKeyboardButton("Nagad", callback_data="m_nagad")],
-        [InlineKeyboardButton("❌ বাতিল", callback_data="cancel")]
-    ]))
+    await query.edit_message_text("পেমেন্ট মেথড সিলেক্ট করুন:", reply_markup=WD_METHOD_KB)
     return WD_METHOD
 
 async def withdraw_method(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -388,53 +699,55 @@ async def withdraw_number(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def withdraw_amount(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    user = get_user(user_id)
+    user = await asyncio.to_thread(get_user, user_id, fields=['balance'])
     config = get_config()
     
     try:
         amount = float(update.message.text)
         
         if amount < config['min_withdraw']:
-             await update.message.reply_text(f"❌ সর্বনিম্ন উইথড্র ৳{config['min_withdraw']:.2f}", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]]))
+             await update.message.reply_text(f"❌ সর্বনিম্ন উইথড্র ৳{config['min_withdraw']:.2f}", reply_markup=BACK_HOME_KB)
              return ConversationHandler.END
 
         if amount > user['balance']:
-            await update.message.reply_text("❌ আপনার একাউন্টে পর্যাপ্ত ব্যালেন্স নেই।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]]))
+            await update.message.reply_text("❌ আপনার একাউন্টে পর্যাপ্ত ব্যালেন্স নেই।", reply_markup=BACK_HOME_KB)
             return ConversationHandler.END
 
-        # ব্যালেন্স কাটা এবং রিকোয়েস্ট তৈরি
-        db.collection('users').document(user_id).update({"balance": firestore.Increment(-amount)})
-        
-        wd_ref = db.collection('withdrawals').add({
+        # ব্যালেন্স কাটা এবং রিকোয়েস্ট তৈরি একটি batch এ (দুটোই হবে অথবা কোনোটাই না)
+        wd_ref = db.collection('withdrawals').document()
+        batch = db.batch()
+        batch.update(db.collection('users').document(user_id), {"balance": firestore.Increment(-amount)})
+        batch.set(wd_ref, {
             "user_id": user_id,
             "user_name": update.effective_user.first_name,
             "amount": amount,
             "method": context.user_data['wd_method'],
             "number": context.user_data['wd_number'],
             "status": "pending",
-            "time": datetime.now()
+            "time": firestore.SERVER_TIMESTAMP
         })
+        await asyncio.to_thread(batch.commit)
         
         # লগ গ্রুপে পাঠানো
         admin_msg = (
             f"💸 **New Withdrawal Request**\n"
             f"👤 User: `{user_id}`\n"
             f"💰 Amount: ৳{amount:.2f}\n"
-            f"📱 Method: {context.user_data['wd_method']} ({context.user_data['wd_number']})"
+            f"📱 Method: {context.user_data['wd_method']} ({md(context.user_data['wd_number'])})"
         )
         kb = InlineKeyboardMarkup([
-            [InlineKeyboardButton("✅ Approve", callback_data=f"wd_apr_{wd_ref[1].id}_{user_id}"), 
-             InlineKeyboardButton("❌ Reject", callback_data=f"wd_rej_{wd_ref[1].id}_{user_id}")]
+            [InlineKeyboardButton("✅ Approve", callback_data=f"wd_apr_{wd_ref.id}_{user_id}"), 
+             InlineKeyboardButton("❌ Reject", callback_data=f"wd_rej_{wd_ref.id}_{user_id}")]
         ])
         
         await send_log_message(context, admin_msg, kb)
-        await update.message.reply_text("✅ উইথড্র রিকোয়েস্ট সফল হয়েছে! এডমিন চেক করে পেমেন্ট করবে।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]]))
+        await update.message.reply_text("✅ উইথড্র রিকোয়েস্ট সফল হয়েছে! এডমিন চেক করে পেমেন্ট করবে।", reply_markup=BACK_HOME_KB)
         
     except ValueError:
-        await update.message.reply_text("❌ ভুল ইনপুট। শুধু সংখ্যা ব্যবহার করুন।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]]))
+        await update.message.reply_text("❌ ভুল ইনপুট। শুধু সংখ্যা ব্যবহার করুন।", reply_markup=BACK_HOME_KB)
     except Exception as e:
         logger.error(f"Withdraw Error: {e}")
-        await update.message.reply_text("❌ সমস্যা হয়েছে। পরে চেষ্টা করুন।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]]))
+        await update.message.reply_text("❌ সমস্যা হয়েছে। পরে চেষ্টা করুন।", reply_markup=BACK_HOME_KB)
         
     return ConversationHandler.END
 
@@ -449,29 +762,41 @@ async def handle_withdrawal_action(update: Update, context: ContextTypes.DEFAULT
     wd_id = data[2]
     user_id = data[3]
     
-    wd_doc = db.collection('withdrawals').document(wd_id).get()
-    if not wd_doc.exists:
+    # স্ট্যাটাস চেক + আপডেট + রিফান্ড একটি ট্রানজ্যাকশনে (দুই এডমিন একসাথে ক্লিক করলেও একবারই হবে)
+    status, wd_data = await asyncio.to_thread(_settle_withdrawal_tx, db.transaction(), db.collection('withdrawals').document(wd_id),
+                                              db.collection('users').document(user_id), action, query.from_user.id)
+    if status is None:
         await query.answer("Withdrawal request not found.", show_alert=True)
         return
-    
-    wd_data = wd_doc.to_dict()
-    if wd_data['status'] != 'pending':
-        await query.answer(f"Already processed ({wd_data['status']})", show_alert=True)
+    if status != 'pending':
+        await query.answer(f"Already processed ({status})", show_alert=True)
         return
 
     amount = wd_data['amount']
 
     if action == "apr":
-        db.collection('withdrawals').document(wd_id).update({"status": "approved", "processed_by": query.from_user.id})
         await query.edit_message_text(f"✅ Approved Withdrawal for `{user_id}` (৳{amount:.2f})", parse_mode="Markdown")
-        await context.bot.send_message(chat_id=user_id, text=f"✅ আপনার ৳{amount:.2f} উইথড্র সফল হয়েছে!")
+        await context.bot.send_message(chat_id=user_id, text=f"✅ আপনার ৳{amount:.2f} উইথড্র সফল হয়েছে!")
         
     elif action == "rej":
-        db.collection('withdrawals').document(wd_id).update({"status": "rejected", "processed_by": query.from_user.id})
-        # টাকা ফেরত দেওয়া
-        db.collection('users').document(user_id).update({"balance": firestore.Increment(amount)})
         await query.edit_message_text(f"❌ Rejected & Refunded for `{user_id}` (৳{amount:.2f})", parse_mode="Markdown")
-        await context.bot.send_message(chat_id=user_id, text=f"❌ আপনার ৳{amount:.2f} উইথড্র বাতিল হয়েছে এবং ব্যালেন্স ফেরত দেওয়া হয়েছে।")
+        await context.bot.send_message(chat_id=user_id, text=f"❌ আপনার ৳{amount:.2f} উইথড্র বাতিল হয়েছে এবং ব্যালেন্স ফেরত দেওয়া হয়েছে।")
+
+@firestore.transactional
+def _settle_withdrawal_tx(transaction, wd_ref, user_ref, action, admin_id):
+    """আগের স্ট্যাটাস ও ডাটা রিটার্ন করে; pending হলে তবেই আপডেট হয় (না পেলে None)"""
+    snap = wd_ref.get(transaction=transaction)
+    if not snap.exists: return None, None
+    wd_data = snap.to_dict()
+    if wd_data['status'] != 'pending': return wd_data['status'], wd_data
+
+    if action == "apr":
+        transaction.update(wd_ref, {"status": "approved", "processed_by": admin_id})
+    elif action == "rej":
+        transaction.update(wd_ref, {"status": "rejected", "processed_by": admin_id})
+        # টাকা ফেরত দেওয়া
+        transaction.update(user_ref, {"balance": firestore.Increment(wd_data['amount'])})
+    return 'pending', wd_data
 
 # --- Task Submission System (Bot Side) ---
 
@@ -482,26 +807,28 @@ async def start_task_submission(update: Update, context: ContextTypes.DEFAULT_TY
     
     # সময় চেক
     if not is_working_hour():
-        s_time = datetime.strptime(config.get('work_start_time', '15:30'), "%H:%M").strftime("%I:%M %p")
-        e_time = datetime.strptime(config.get('work_end_time', '23:00'), "%H:%M").strftime("%I:%M %p")
+        s_time = config['_start_disp']
+        e_time = config['_end_disp']
         
         await query.edit_message_text(
             f"⛔ **এখন কাজের সময় নয়!**\n\n"
             f"⏰ কাজের সময়: `{s_time}` থেকে `{e_time}` পর্যন্ত।",
             parse_mode="Markdown",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]])
+            reply_markup=BACK_HOME_KB
         )
         return ConversationHandler.END
 
     apps = config.get('monitored_apps', [])
     if not apps:
-        await query.edit_message_text("❌ বর্তমানে কোনো কাজ নেই।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙", callback_data="back_home")]]))
+        await query.edit_message_text("❌ বর্তমানে কোনো কাজ নেই।", reply_markup=BACK_KB)
         return ConversationHandler.END
         
+    # সব অ্যাপের কাউন্ট একসাথে (প্যারালাল) আনা হচ্ছে, একটার পর একটা নয়
+    counts = await asyncio.gather(*[asyncio.to_thread(get_app_task_count, a['id']) for a in apps])
+
     buttons = []
-    for app in apps:
+    for app, count in zip(apps, counts):
         limit = app.get('limit', 1000)
-        count = get_app_task_count(app['id'])
         
         btn_text = f"📱 {app['name']} ({count}/{limit}) - ৳{config['task_price']:.0f}"
         if count >= limit:
@@ -521,19 +848,19 @@ async def app_selected(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     app_id = query.data.split("sel_")[1]
     config = get_config()
-    app = next((a for a in config['monitored_apps'] if a['id'] == app_id), None)
+    app = config['_apps_by_id'].get(app_id)
     
     if not app:
-        await query.edit_message_text("❌ অ্যাপটি খুঁজে পাওয়া যায়নি।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙", callback_data="back_home")]]))
+        await query.edit_message_text("❌ অ্যাপটি খুঁজে পাওয়া যায়নি।", reply_markup=BACK_KB)
         return ConversationHandler.END
         
     limit = app.get('limit', 1000)
-    count = get_app_task_count(app_id)
+    count = await asyncio.to_thread(get_app_task_count, app_id)
     
     if count >= limit:
          await query.edit_message_text(f"⛔ **দুঃখিত!**\n\n`{app['name']}` এর কাজের লিমিট শেষ।", 
                                        parse_mode="Markdown",
-                                       reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]]))
+                                       reply_markup=BACK_HOME_KB)
          return ConversationHandler.END
 
     context.user_data['tid'] = app_id
@@ -562,33 +889,11 @@ async def save_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     
     screenshot_link = ""
+    photo_id = None
     
     if update.message.photo:
-        wait_msg = await update.message.reply_text("📤 ছবি আপলোড হচ্ছে... অনুগ্রহ করে অপেক্ষা করুন।")
-        try:
-            photo = await update.message.photo[-1].get_file()
-            img_bytes = io.BytesIO()
-            await photo.download_to_memory(img_bytes)
-            img_bytes.seek(0)
-            
-            # ImgBB Upload
-            if IMGBB_API_KEY:
-                files = {'image': img_bytes}
-                payload = {'key': IMGBB_API_KEY}
-                response = requests.post("https://api.imgbb.com/1/upload", data=payload, files=files)
-                result = response.json()
-                if result.get('success'):
-                    screenshot_link = result['data']['url']
-                else:
-                    await wait_msg.edit_text("❌ ছবি আপলোড ব্যর্থ হয়েছে।")
-                    return T_SS
-            else:
-                await wait_msg.edit_text("❌ ImgBB API Key কনফিগার করা নেই।")
-                return ConversationHandler.END
-            await wait_msg.delete()
-        except Exception as e:
-            await wait_msg.edit_text("❌ টেকনিক্যাল সমস্যা হয়েছে।")
-            return ConversationHandler.END
+        # ছবি টেলিগ্রামেই থাকে; file_id সেভ করা হচ্ছে, ImgBB আপলোড হট-পাথে নয়
+        photo_id = update.message.photo[-1].file_id
 
     elif update.message.text:
         screenshot_link = update.message.text.strip()
@@ -597,26 +902,29 @@ async def save_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ অনুগ্রহ করে ছবি বা লিংক দিন।")
         return T_SS
 
-    app_name = next((a['name'] for a in config['monitored_apps'] if a['id'] == data['tid']), data['tid'])
+    app = config['_apps_by_id'].get(data['tid'])
+    app_name = app['name'] if app else data['tid']
     
-    task_ref = db.collection('tasks').add({
+    task_ref = await asyncio.to_thread(db.collection('tasks').add, {
         "user_id": str(user.id),
         "app_id": data['tid'],
         "review_name": data['rname'],
+        "review_name_lc": data['rname'].lower().strip(),
         "email": data['email'],
         "device": data['dev'],
         "screenshot": screenshot_link,
+        "screenshot_file_id": photo_id,
         "status": "pending",
-        "submitted_at": datetime.now(),
+        "submitted_at": firestore.SERVER_TIMESTAMP,
         "price": config['task_price']
     })
     
     log_msg = (
         f"📝 **New Task Submitted**\n"
         f"👤 User: `{user.id}`\n"
-        f"📱 App: **{app_name}**\n"
-        f"✍️ Name: {data['rname']}\n"
-        f"🖼 Proof: [View Screenshot]({screenshot_link})\n"
+        f"📱 App: **{md(app_name)}**\n"
+        f"✍️ Name: {md(data['rname'])}\n"
+        f"🖼 Proof: {'📎 Attached' if photo_id else proof_link(screenshot_link)}\n"
         f"💰 Price: ৳{config['task_price']:.2f}"
     )
     
@@ -625,16 +933,47 @@ async def save_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
          InlineKeyboardButton("❌ Reject", callback_data=f"t_rej_{task_ref[1].id}_{user.id}")]
     ])
     
-    await send_log_message(context, log_msg, kb)
-    await update.message.reply_text("✅ কাজ জমা হয়েছে! এডমিন চেক করে এপ্রুভ করবেন।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]]))
+    await send_log_message(context, log_msg, kb, photo=photo_id)
+    if photo_id and IMGBB_API_KEY:
+        # বায়ার রিপোর্ট ও ওয়েব ড্যাশবোর্ডের জন্য বাইরের লিংক ব্যাকগ্রাউন্ডে তৈরি হবে
+        context.application.create_task(mirror_screenshot(context, task_ref[1].id, photo_id))
+    await update.message.reply_text("✅ কাজ জমা হয়েছে! এডমিন চেক করে এপ্রুভ করবেন।", reply_markup=BACK_HOME_KB)
     return ConversationHandler.END
 
+async def mirror_screenshot(context, task_id, photo_id):
+    """টাস্কের ছবি ImgBB তে আপলোড করে screenshot লিংক আপডেট করে (ব্যাকগ্রাউন্ড)"""
+    try:
+        photo = await context.bot.get_file(photo_id)
+        client = context.bot_data['http']
+        # ১MB এর বেশি হলে ডিস্কে যায়; ডাউনলোড চাংক করে ফাইলে লেখা হয় (download_to_memory পুরো bytes একসাথে আনে),
+        # আর httpx ফাইলটি চাংক করে পাঠায়, তাই পুরো ছবি একবারে RAM এ থাকে না
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as img_file:
+            async with client.stream("GET", photo.file_path) as dl:
+                if dl.status_code != 200:
+                    # URL এ বট টোকেন থাকে, তাই লগে শুধু স্ট্যাটাস
+                    logger.error(f"Screenshot Download Failed for task {task_id}: HTTP {dl.status_code}")
+                    return
+                async for chunk in dl.aiter_bytes(64 * 1024):
+                    img_file.write(chunk)
+            img_file.seek(0)
+
+            files = {'image': ('screenshot.jpg', img_file)}
+            payload = {'key': IMGBB_API_KEY}
+            response = await client.post("https://api.imgbb.com/1/upload", data=payload, files=files)
+        result = response.json()
+        if result.get('success'):
+            await asyncio.to_thread(db.collection('tasks').document(task_id).update, {"screenshot": result['data']['url']})
+        else:
+            logger.error(f"ImgBB Upload Failed for task {task_id}")
+    except Exception as e:
+        logger.error(f"Screenshot Mirror Error: {e}")
+
 async def cancel_conv(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         if update.callback_query:
-            await update.callback_query.edit_message_text("❌ বাতিল করা হয়েছে।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]]))
+            await update.callback_query.edit_message_text("❌ বাতিল করা হয়েছে।", reply_markup=BACK_HOME_KB)
         else:
-            await update.message.reply_text("❌ বাতিল করা হয়েছে।", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 হোম", callback_data="back_home")]]))
+            await update.message.reply_text("❌ বাতিল করা হয়েছে।", reply_markup=BACK_HOME_KB)
     except: pass
     return ConversationHandler.END
 
@@ -650,32 +989,43 @@ async def handle_task_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = data[3]
     
     task_ref = db.collection('tasks').document(task_id)
-    task_doc = task_ref.get()
-    
-    if not task_doc.exists:
+    # স্ট্যাটাস চেক + আপডেট + ব্যালেন্স একটি ট্রানজ্যাকশনে (আলাদা get() এর দরকার নেই, রেস-সেফ)
+    status, t_data = await asyncio.to_thread(_settle_task_tx, db.transaction(), task_ref, db.collection('users').document(str(user_id)),
+                                             action, query.from_user.id)
+    if status is None:
         await query.answer("Task not found", show_alert=True)
         return
-        
-    t_data = task_doc.to_dict()
-    if t_data['status'] != 'pending':
-        await query.answer(f"Task is already {t_data['status']}", show_alert=True)
+    if status != 'pending':
+        await query.answer(f"Task is already {status}", show_alert=True)
         return
 
     price = t_data.get('price', 0)
     
     if action == "apr":
-        task_ref.update({"status": "approved", "approved_at": datetime.now()})
-        db.collection('users').document(str(user_id)).update({
-            "balance": firestore.Increment(price),
+        await edit_log_message(query, f"✅ Task Approved Manually\nUser: `{user_id}` (৳{price:.2f})")
+        await context.bot.send_message(chat_id=user_id, text=f"🎉 আপনার কাজটি এপ্রুভ হয়েছে! ৳{price:.2f} যোগ হয়েছে।")
+        
+    elif action == "rej":
+        await edit_log_message(query, f"❌ Task Rejected Manually\nUser: `{user_id}`")
+        await context.bot.send_message(chat_id=user_id, text="❌ আপনার কাজটি রিজেক্ট করা হয়েছে। সঠিক তথ্য দিয়ে আবার চেষ্টা করুন।")
+
+@firestore.transactional
+def _settle_task_tx(transaction, task_ref, user_ref, action, admin_id):
+    """আগের স্ট্যাটাস ও টাস্ক ডাটা রিটার্ন করে; pending হলে তবেই আপডেট হয় (না পেলে None)"""
+    snap = task_ref.get(transaction=transaction)
+    if not snap.exists: return None, None
+    t_data = snap.to_dict()
+    if t_data['status'] != 'pending': return t_data['status'], t_data
+
+    if action == "apr":
+        transaction.update(task_ref, {"status": "approved", "approved_at": firestore.SERVER_TIMESTAMP})
+        transaction.update(user_ref, {
+            "balance": firestore.Increment(t_data.get('price', 0)),
             "total_tasks": firestore.Increment(1)
         })
-        await query.edit_message_text(f"✅ Task Approved Manually\nUser: `{user_id}` (৳{price:.2f})", parse_mode="Markdown")
-        await context.bot.send_message(chat_id=user_id, text=f"🎉 আপনার কাজটি এপ্রুভ হয়েছে! ৳{price:.2f} যোগ হয়েছে।")
-        
     elif action == "rej":
-        task_ref.update({"status": "rejected", "processed_by": query.from_user.id})
-        await query.edit_message_text(f"❌ Task Rejected Manually\nUser: `{user_id}`", parse_mode="Markdown")
-        await context.bot.send_message(chat_id=user_id, text="❌ আপনার কাজটি রিজেক্ট করা হয়েছে। সঠিক তথ্য দিয়ে আবার চেষ্টা করুন।")
+        transaction.update(task_ref, {"status": "rejected", "processed_by": admin_id})
+    return 'pending', t_data
 
 # ==========================================
 # 5. অটোমেশন (Play Store Monitor & Web App Listener)
@@ -684,7 +1034,7 @@ async def handle_task_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
 def check_new_submissions():
     """Web App থেকে আসা নতুন টাস্ক এবং উইথড্র চেক করে নোটিফিকেশন পাঠাবে"""
     config = get_config()
-    log_id = config.get('log_channel_id', OWNER_ID)
+    log_id = LOG_CHANNEL_ID
 
     # ১. পেন্ডিং টাস্ক চেক (যেগুলো নোটিফাই করা হয়নি)
     try:
@@ -697,21 +1047,17 @@ def check_new_submissions():
             if not t_data.get('notified_to_admin', False):
                 
                 # নোটিফিকেশন মেসেজ
-                app_name = t_data.get('app_id', 'Unknown App') # অ্যাপ নেম বা আইডি
-                # অ্যাপ নেম বের করার চেষ্টা
-                for a in config.get('monitored_apps', []):
-                    if a['id'] == t_data['app_id']:
-                        app_name = a['name']
-                        break
+                app = config['_apps_by_id'].get(t_data.get('app_id'))
+                app_name = app['name'] if app else t_data.get('app_id', 'Unknown App')
 
                 log_msg = (
                     f"📝 **New Task Submitted (Via App/Web)**\n"
                     f"👤 User: `{t_data.get('user_id')}`\n"
-                    f"📱 App: **{app_name}**\n"
-                    f"✍️ Name: {t_data.get('review_name')}\n"
-                    f"📧 Email: {t_data.get('email')}\n"
-                    f"📱 Device: {t_data.get('device')}\n"
-                    f"🖼 Proof: [View Screenshot]({t_data.get('screenshot')})\n"
+                    f"📱 App: **{md(app_name)}**\n"
+                    f"✍️ Name: {md(t_data.get('review_name'))}\n"
+                    f"📧 Email: {md(t_data.get('email'))}\n"
+                    f"📱 Device: {md(t_data.get('device'))}\n"
+                    f"🖼 Proof: {proof_link(t_data.get('screenshot'))}\n"
                     f"💰 Price: ৳{t_data.get('price', 0):.2f}"
                 )
                 
@@ -724,7 +1070,6 @@ def check_new_submissions():
                 # মেসেজ পাঠানো এবং ডাটাবেসে আপডেট করা যে মেসেজ পাঠানো হয়েছে
                 send_telegram_message(log_msg, chat_id=log_id, reply_markup=kb)
                 db.collection('tasks').document(t.id).update({"notified_to_admin": True})
-                time.sleep(1) # টেলিগ্রাম লিমিট এড়াতে ১ সেকেন্ড বিরতি
 
     except Exception as e:
         logger.error(f"Task Checker Error: {e}")
@@ -739,9 +1084,9 @@ def check_new_submissions():
                 
                 admin_msg = (
                     f"💸 **New Withdrawal Request (Via App/Web)**\n"
-                    f"👤 User: `{w_data.get('user_id')}` ({w_data.get('user_name', 'User')})\n"
+                    f"👤 User: `{w_data.get('user_id')}` ({md(w_data.get('user_name', 'User'))})\n"
                     f"💰 Amount: ৳{w_data.get('amount'):.2f}\n"
-                    f"📱 Method: {w_data.get('method')} ({w_data.get('number')})"
+                    f"📱 Method: {md(w_data.get('method'))} ({md(w_data.get('number'))})"
                 )
                 
                 kb = InlineKeyboardMarkup([
@@ -752,77 +1097,155 @@ def check_new_submissions():
                 
                 send_telegram_message(admin_msg, chat_id=log_id, reply_markup=kb)
                 db.collection('withdrawals').document(w.id).update({"notified_to_admin": True})
-                time.sleep(1)
 
     except Exception as e:
         logger.error(f"Withdraw Checker Error: {e}")
 
-def run_automation():
-    logger.info("Automation & Listener Started...")
-    last_review_check = datetime.now()
-    
-    while True:
+def is_seen_review(rid):
+    with _SEEN_LOCK:
+        if rid in SEEN_REVIEW_IDS:
+            SEEN_REVIEW_IDS.move_to_end(rid)
+            return True
+        return False
+
+def mark_seen_review(rid):
+    with _SEEN_LOCK:
+        SEEN_REVIEW_IDS[rid] = True
+        SEEN_REVIEW_IDS.move_to_end(rid)
+        if len(SEEN_REVIEW_IDS) > SEEN_REVIEW_CAP:
+            SEEN_REVIEW_IDS.popitem(last=False)
+
+def check_app_reviews(app, log_id):
+    """একটি অ্যাপের নতুন Play Store রিভিউ চেক করে নোটিফাই ও অটো-এপ্রুভ করে"""
+    reviews, _ = play_reviews(app['id'], count=10, sort=Sort.NEWEST)
+    cutoff = datetime.now() - timedelta(hours=48)
+    # মেমোরিতে থাকা (আগের সাইকেলে দেখা) রিভিউ বাদ; শুধু বাকিগুলো Firestore এ চেক হবে
+    reviews = [r for r in reviews if r['at'] >= cutoff and not is_seen_review(r['reviewId'])]
+    if not reviews: return
+
+    # এক RPC তে সব seen_reviews চেক করা হচ্ছে (প্রতি রিভিউতে আলাদা get() এর বদলে)
+    seen_refs = [db.collection('seen_reviews').document(r['reviewId']) for r in reviews]
+    existing = {s.id for s in db.get_all(seen_refs) if s.exists}
+    for rid in existing: mark_seen_review(rid)
+    seen_batch = db.batch()
+    new_seen = []
+
+    try:
+        for r, seen_ref in zip(reviews, seen_refs):
+            if r['reviewId'] in existing: continue
+
+            r_date = r['at']
+            date_str = r_date.strftime("%d-%m-%Y %I:%M %p")
+
+            # নোটিফিকেশন আগে চলে যায় (Mood: ⏳), AI উত্তর এলে মেসেজ এডিট হয়
+            msg = f"🔔 **Play Store Review Found**\n📱 App: `{app['name']}`\n👤 Name: **{md(r['userName'])}**\n⭐ {r['score']}/5\n💬 {md(r['content'])}\n"
+            if AI_ENABLED and len((r['content'] or '').strip()) >= AI_MIN_CHARS:
+                sent = send_telegram_message(msg + "Mood: ⏳", chat_id=log_id)
+                if sent is not None:
+                    fut = asyncio.run_coroutine_threadsafe(add_review_mood(sent, msg, r['content'], r['score']), BOT_LOOP)
+                    fut.add_done_callback(_log_send_error)
+            else:
+                send_telegram_message(msg + "Mood: N/A", chat_id=log_id)
+            # অ্যালার্ট গেলেই seen মার্ক; পরের কুয়েরি/এপ্রুভে এরর হলেও একই রিভিউ আবার অ্যালার্ট হবে না
+            seen_batch.set(seen_ref, {"t": firestore.SERVER_TIMESTAMP})
+            new_seen.append(r['reviewId'])
+
+            match = None
+            if r['score'] == 5:
+                # ইনডেক্সড কুয়েরি: সব পেন্ডিং টাস্ক না এনে শুধু নাম মিলে এমন একটি
+                p_tasks = (db.collection('tasks')
+                           .where('app_id', '==', app['id'])
+                           .where('status', '==', 'pending')
+                           .where('review_name_lc', '==', r['userName'].lower().strip())
+                           .limit(1).stream())
+                match = next(iter(p_tasks), None)
+
+            if not match: continue
+
+            # টাস্ক এপ্রুভ + ব্যালেন্স একই ট্রানজ্যাকশনে, যাতে এডমিনের ম্যানুয়াল এপ্রুভের সাথে ডাবল পেমেন্ট না হয়
+            td = match.to_dict()
+            status, _ = _settle_task_tx(db.transaction(), match.reference,
+                                        db.collection('users').document(str(td['user_id'])), "apr", None)
+            if status != 'pending': continue
+
+            send_telegram_message(f"🤖 **Auto Approved!**\nUser: `{td['user_id']}`", chat_id=log_id)
+            send_telegram_message(f"🎉 অটোমেটিক এপ্রুভ হয়েছে!", chat_id=td['user_id'])
+    finally:
+        # নতুন seen_reviews গুলো একটি batch এ লেখা হচ্ছে
+        if new_seen:
+            seen_batch.commit()
+            for rid in new_seen: mark_seen_review(rid)
+
+def backfill_review_name_lc():
+    """পুরনো পেন্ডিং টাস্কে review_name_lc না থাকলে যোগ করা হচ্ছে (অটো-এপ্রুভ কুয়েরির জন্য)"""
+    try:
+        batch, pending = db.batch(), 0
+        for t in db.collection('tasks').where('status', '==', 'pending').stream():
+            td = t.to_dict()
+            if 'review_name_lc' in td or not td.get('review_name'): continue
+            batch.update(t.reference, {"review_name_lc": td['review_name'].lower().strip()})
+            pending += 1
+            if pending == 500: # Firestore batch লিমিট
+                batch.commit()
+                batch, pending = db.batch(), 0
+        if pending: batch.commit()
+    except Exception as e:
+        logger.error(f"Backfill Error: {e}")
+
+async def process_app_reviews(app, log_id, sem):
+    async with sem:
         try:
-            # ১. অ্যাপ/ওয়েব থেকে আসা রিকোয়েস্ট চেক করুন (প্রতি ১০ সেকেন্ডে)
-            check_new_submissions()
-            
-            # ২. প্লে-স্টোর রিভিউ চেক করুন (প্রতি ৫ মিনিটে)
-            if (datetime.now() - last_review_check).total_seconds() > 300:
-                config = get_config()
-                apps = config.get('monitored_apps', [])
-                log_id = config.get('log_channel_id', OWNER_ID)
-                
-                for app in apps:
-                    try:
-                        reviews, _ = play_reviews(app['id'], count=10, sort=Sort.NEWEST)
-                        for r in reviews:
-                            rid = r['reviewId']
-                            r_date = r['at']
-                            if r_date < datetime.now() - timedelta(hours=48): continue
-                            
-                            if not db.collection('seen_reviews').document(rid).get().exists:
-                                # ... (আগের রিভিউ লজিক অপরিবর্তিত থাকবে) ...
-                                date_str = r_date.strftime("%d-%m-%Y %I:%M %p")
-                                ai_txt = get_ai_summary(r['content'], r['score'])
-                                
-                                msg = f"🔔 **Play Store Review Found**\n📱 App: `{app['name']}`\n👤 Name: **{r['userName']}**\n⭐ {r['score']}/5\n💬 {r['content']}\nMood: {ai_txt}"
-                                send_telegram_message(msg, chat_id=log_id)
-                                db.collection('seen_reviews').document(rid).set({"t": datetime.now()})
-
-                                if r['score'] == 5:
-                                    p_tasks = db.collection('tasks').where('app_id', '==', app['id']).where('status', '==', 'pending').stream()
-                                    for t in p_tasks:
-                                        td = t.to_dict()
-                                        if td['review_name'].lower().strip() == r['userName'].lower().strip():
-                                            price = td.get('price', 0)
-                                            db.collection('tasks').document(t.id).update({"status": "approved", "approved_at": datetime.now()})
-                                            db.collection('users').document(str(td['user_id'])).update({
-                                                "balance": firestore.Increment(price),
-                                                "total_tasks": firestore.Increment(1)
-                                            })
-                                            send_telegram_message(f"🤖 **Auto Approved!**\nUser: `{td['user_id']}`", chat_id=log_id)
-                                            send_telegram_message(f"🎉 অটোমেটিক এপ্রুভ হয়েছে!", chat_id=td['user_id'])
-                                            break
-                    except Exception: pass
-                
-                last_review_check = datetime.now()
-                
+            await asyncio.to_thread(check_app_reviews, app, log_id)
         except Exception as e:
-            logger.error(f"Loop Error: {e}")
-            
-        time.sleep(10) # ১০ সেকেন্ড বিরতি (যাতে সার্ভারে লোড না পড়ে)
+            logger.error(f"Review Check Error ({app.get('id')}): {e}")
+
+# অটোমেশন এখন PTB এর job_queue এ চলে (বটের নিজের লুপে, আলাদা থ্রেড বা sleep লুপ নেই)
+async def backfill_job(context: ContextTypes.DEFAULT_TYPE):
+    logger.info("Automation & Listener Started...")
+    await asyncio.to_thread(backfill_review_name_lc)
+
+async def admins_job(context: ContextTypes.DEFAULT_TYPE):
+    await asyncio.to_thread(refresh_admins)
+
+async def submissions_job(context: ContextTypes.DEFAULT_TYPE):
+    # অ্যাপ/ওয়েব থেকে আসা রিকোয়েস্ট চেক (প্রতি ১০ সেকেন্ডে)
+    try:
+        await asyncio.to_thread(check_new_submissions)
+    except Exception as e:
+        logger.error(f"Loop Error: {e}")
+
+async def reviews_job(context: ContextTypes.DEFAULT_TYPE):
+    # প্লে-স্টোর রিভিউ চেক (প্রতি ৫ মিনিটে), অ্যাপগুলো প্যারালালে
+    try:
+        config = get_config()
+        apps = config.get('monitored_apps', [])
+        log_id = LOG_CHANNEL_ID
+        # একসাথে সর্বোচ্চ ৪টি অ্যাপ (Firestore/Play Store এ অতিরিক্ত চাপ এড়াতে)
+        sem = asyncio.Semaphore(4)
+        await asyncio.gather(*[process_app_reviews(app, log_id, sem) for app in apps])
+    except Exception as e:
+        logger.error(f"Loop Error: {e}")
 
 def send_telegram_message(message, chat_id=None, reply_markup=None):
-    if not chat_id: return
+    """অটোমেশন থ্রেড থেকে বটের লুপে মেসেজ পাঠায় (PTB এর পুল করা ক্লায়েন্ট ব্যবহার করে, থ্রেড ব্লক করে না)"""
+    if not chat_id or BOT_LOOP is None: return
     try:
-        payload = {"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}
-        if reply_markup:
-            if hasattr(reply_markup, 'to_dict'):
-                 payload["reply_markup"] = reply_markup.to_dict()
-            else:
-                 payload["reply_markup"] = reply_markup
-        requests.post(f"https://api.telegram.org/bot{TOKEN}/sendMessage", json=payload, timeout=10)
-    except: pass
+        fut = asyncio.run_coroutine_threadsafe(
+            BOT_APP.bot.send_message(chat_id=chat_id, text=message, parse_mode="Markdown", reply_markup=reply_markup),
+            BOT_LOOP
+        )
+        fut.add_done_callback(_log_send_error)
+        return fut
+    except: return None
+
+async def add_review_mood(sent, msg, text, rating):
+    """AI মুড আর নোটিফিকেশন পাঠানো একসাথে চলে; দুটো শেষ হলে মেসেজ এডিট"""
+    mood, message = await asyncio.gather(get_ai_summary(text, rating), asyncio.wrap_future(sent))
+    await message.edit_text(msg + f"Mood: {md(mood)}", parse_mode="Markdown")
+
+def _log_send_error(fut):
+    if not fut.cancelled() and fut.exception():
+        logger.warning(f"Send Message Error: {fut.exception()}")
 
 # ==========================================
 # 6. এডমিন প্যানেল (Complete)
@@ -832,14 +1255,7 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     if not is_admin(query.from_user.id): return
 
-    kb = [
-        [InlineKeyboardButton("👥 Users & Balance", callback_data="adm_users"), InlineKeyboardButton("💰 Finance & Liability", callback_data="adm_finance")],
-        [InlineKeyboardButton("📱 Apps Manage", callback_data="adm_apps"), InlineKeyboardButton("👮 Manage Admins", callback_data="adm_admins")],
-        [InlineKeyboardButton("🎨 Buttons & Time", callback_data="adm_content"), InlineKeyboardButton("📢 Log Channel", callback_data="adm_log")],
-        [InlineKeyboardButton("📊 Reports & Stats", callback_data="adm_reports")],
-        [InlineKeyboardButton("🔙 Back to User Mode", callback_data="back_home")]
-    ]
-    await query.edit_message_text("⚙️ **Super Admin Panel**", parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
+    await query.edit_message_text("⚙️ **Super Admin Panel**", parse_mode="Markdown", reply_markup=ADMIN_PANEL_KB)
 
 # --- Admin Reports & Exports (UPDATED FOR BUYER - APPROVED ONLY) ---
 async def admin_reports_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -849,14 +1265,9 @@ async def admin_reports_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
     apps = config.get('monitored_apps', [])
     
     msg = "📊 **Reports & Statistics**\n\nBuyer এর জন্য রিপোর্ট ডাউনলোড করতে অ্যাপ সিলেক্ট করুন (Only Approved Tasks)।\nঅথবা Daily Stats দেখুন।"
-    kb = []
-    
-    # অ্যাপগুলোর বাটন ডাইনামিক্যালি তৈরি হচ্ছে
-    for app in apps:
-        kb.append([InlineKeyboardButton(f"📱 {app['name']}", callback_data=f"rep_select_app_{app['id']}")])
-        
-    kb.append([InlineKeyboardButton("📊 Daily Approved Stats (Last 7 Days)", callback_data="adm_daily_stats")])
-    kb.append([InlineKeyboardButton("🔙 Back", callback_data="admin_panel")])
+    # শুধু অ্যাপগুলোর বাটন ডাইনামিক্যালি তৈরি হচ্ছে, শেষের সারিগুলো স্থির
+    kb = [[InlineKeyboardButton(f"📱 {app['name']}", callback_data=f"rep_select_app_{app['id']}")] for app in apps]
+    kb.extend(REPORTS_TAIL_ROWS)
     await query.edit_message_text(msg, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
 
 async def admin_report_timeframe(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -874,6 +1285,16 @@ async def admin_report_timeframe(update: Update, context: ContextTypes.DEFAULT_T
     ]
     await query.edit_message_text(msg, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
 
+def stream_pages(query, page_size=500):
+    """বড় কুয়েরি ৫০০ করে পেজে আনা (কার্সর দিয়ে), একটানা লম্বা স্ট্রিম নয়"""
+    last = None
+    while True:
+        page = query.start_after(last) if last else query
+        docs = list(page.limit(page_size).stream())
+        yield from docs
+        if len(docs) < page_size: return
+        last = docs[-1]
+
 async def export_report_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer("Generating Approved Report...")
@@ -883,7 +1304,7 @@ async def export_report_data(update: Update, context: ContextTypes.DEFAULT_TYPE)
     app_id = data[2]
     period = data[3]
     
-    now = datetime.now()
+    now = datetime.now(timezone.utc)
     cutoff_date = None
     
     if period == "24h":
@@ -892,54 +1313,59 @@ async def export_report_data(update: Update, context: ContextTypes.DEFAULT_TYPE)
         cutoff_date = now - timedelta(days=7)
 
     # [UPDATE] Filter: ONLY APPROVED TASKS
-    tasks_ref = db.collection('tasks').where('app_id', '==', app_id).where('status', '==', 'approved').stream()
-    data_rows = []
-    
-    for t in tasks_ref:
-        t_data = t.to_dict()
-        
-        # টাইম ফিল্টার
-        sub_time = t_data.get('submitted_at')
-        if not sub_time: continue # টাইম না থাকলে স্কিপ
-        
-        # টাইমজোন ইস্যু এড়াতে
-        try:
-            sub_time = sub_time.replace(tzinfo=None)
-        except: pass
-            
-        if cutoff_date and sub_time < cutoff_date:
-            continue
-
-        # ডাটা সংগ্রহ + [UPDATE] Date যোগ করা
-        row = [
-            t_data.get('review_name', 'N/A'),
-            t_data.get('email', 'N/A'),
-            t_data.get('device', 'N/A'),
-            t_data.get('screenshot', 'N/A'),
-            sub_time.strftime("%Y-%m-%d") # তারিখ যোগ করা হলো বায়ারের সুবিধার জন্য
-        ]
-        data_rows.append(row)
-    
-    if not data_rows:
-        await query.message.reply_text("❌ No APPROVED data found for this period.")
-        return
-
-    # CSV তৈরি
-    output = io.StringIO()
-    writer = csv.writer(output)
-    # [UPDATE] বায়ারের জন্য হেডার এবং ডেট যোগ
-    writer.writerow(["Review Name", "Email Address", "Device Name", "Screenshot Link", "Date"])
-    writer.writerows(data_rows)
-    output.seek(0)
-    
+    q = db.collection('tasks').where('app_id', '==', app_id).where('status', '==', 'approved')
+    # টাইম ফিল্টার Firestore এ (ইনডেক্স ব্যবহার করে), পুরো ইতিহাস ডাউনলোড করে পাইথনে বাদ দেওয়া নয়
+    if cutoff_date:
+        q = q.where('submitted_at', '>=', cutoff_date)
+    # রিপোর্টে যে ফিল্ডগুলো লাগে শুধু সেগুলোই আনা হচ্ছে (পুরো টাস্ক ডকুমেন্ট নয়)
+    q = q.select(['review_name', 'email', 'device', 'screenshot', 'submitted_at']).order_by('submitted_at')
+    tasks_ref = stream_pages(q)
     filename = f"Approved_Report_{app_id}_{period}_{now.strftime('%Y%m%d')}.csv"
-    
-    await context.bot.send_document(
-        chat_id=query.from_user.id,
-        document=io.BytesIO(output.getvalue().encode('utf-8')),
-        filename=filename,
-        caption=f"📊 **Buyer Report (Approved Only)**\nApp: `{app_id}`\nPeriod: `{period}`\nTotal: {len(data_rows)}"
-    )
+
+    # CSV সরাসরি ফাইলে লেখা হচ্ছে ডক আসার সাথে সাথে (লিস্ট + StringIO + BytesIO তিনটা কপি নয়)
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as csv_file:
+        # এক লাইনের বাফার বারবার ব্যবহার (সব পাইথন ভার্সনে SpooledTemporaryFile এ TextIOWrapper চলে না)
+        row_buf = io.StringIO()
+        # unix ডায়ালেক্ট: LF লাইন এন্ডিং; QUOTE_MINIMAL: শুধু দরকার হলে কোট
+        writer = csv.writer(row_buf, dialect='unix', quoting=csv.QUOTE_MINIMAL)
+
+        def write_row(row):
+            writer.writerow(row)
+            csv_file.write(row_buf.getvalue().encode('utf-8'))
+            row_buf.seek(0)
+            row_buf.truncate(0)
+
+        # [UPDATE] বায়ারের জন্য হেডার এবং ডেট যোগ
+        write_row(["Review Name", "Email Address", "Device Name", "Screenshot Link", "Date"])
+        total = 0
+
+        for t in tasks_ref:
+            t_data = t.to_dict()
+            
+            sub_time = t_data.get('submitted_at')
+            if not sub_time: continue # টাইম না থাকলে স্কিপ
+
+            # ডাটা সংগ্রহ + [UPDATE] Date যোগ করা
+            write_row([
+                t_data.get('review_name', 'N/A'),
+                t_data.get('email', 'N/A'),
+                t_data.get('device', 'N/A'),
+                t_data.get('screenshot', 'N/A'),
+                sub_time.strftime("%Y-%m-%d") # তারিখ যোগ করা হলো বায়ারের সুবিধার জন্য
+            ])
+            total += 1
+
+        if not total:
+            await query.message.reply_text("❌ No APPROVED data found for this period.")
+            return
+
+        csv_file.seek(0)
+        await context.bot.send_document(
+            chat_id=query.from_user.id,
+            document=csv_file,
+            filename=filename,
+            caption=f"📊 **Buyer Report (Approved Only)**\nApp: `{app_id}`\nPeriod: `{period}`\nTotal: {total}"
+        )
 
 # [NEW] Daily Stats Handler
 async def admin_daily_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -975,8 +1401,7 @@ async def admin_daily_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         for d in sorted_dates:
             msg += f"📅 `{d}` : **{daily_counts[d]}** tasks\n"
             
-    kb = [[InlineKeyboardButton("🔙 Back", callback_data="adm_reports")]]
-    await query.edit_message_text(msg, parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
+    await query.edit_message_text(msg, parse_mode="Markdown", reply_markup=BACK_REPORTS_KB)
 
 # --- Admin Sub Menus (Updated for Finance) ---
 async def admin_sub_handlers(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -985,8 +1410,7 @@ async def admin_sub_handlers(update: Update, context: ContextTypes.DEFAULT_TYPE)
     data = query.data
     
     if data == "adm_users":
-        kb = [[InlineKeyboardButton("🔍 Manage Specific User", callback_data="find_user")], [InlineKeyboardButton("🔙 Admin Home", callback_data="admin_panel")]]
-        await query.edit_message_text("👥 **User Management**", reply_markup=InlineKeyboardMarkup(kb))
+        await query.edit_message_text("👥 **User Management**", reply_markup=ADM_USERS_KB)
 
     elif data == "adm_finance":
         config = get_config()
@@ -994,7 +1418,8 @@ async def admin_sub_handlers(update: Update, context: ContextTypes.DEFAULT_TYPE)
         # [UPDATE] TOTAL LIABILITY CALCULATION
         await query.message.reply_text("⏳ Calculating Total Liability... Please wait.")
         try:
-            users = db.collection('users').stream()
+            # শুধু balance ফিল্ড আনা হচ্ছে (পুরো ইউজার ডকুমেন্ট নয়)
+            users = db.collection('users').select(['balance']).stream()
             total_liability = sum(u.to_dict().get('balance', 0.0) for u in users)
         except:
             total_liability = 0.0
@@ -1006,39 +1431,25 @@ async def admin_sub_handlers(update: Update, context: ContextTypes.DEFAULT_TYPE)
             f"🔧 Ref Bonus: ৳{config['referral_bonus']}\n"
             f"🔧 Min Withdraw: ৳{config['min_withdraw']}"
         )
-        kb = [[InlineKeyboardButton("✏️ Change Ref Bonus", callback_data="ed_txt_referral_bonus")], [InlineKeyboardButton("🔙 Admin Home", callback_data="admin_panel")]]
         # আগের মেসেজ ডিলিট করে নতুনটা দেওয়া (loading text সরানোর জন্য)
         await query.message.delete()
-        await context.bot.send_message(chat_id=query.from_user.id, text=msg, reply_markup=InlineKeyboardMarkup(kb), parse_mode="Markdown")
+        await context.bot.send_message(chat_id=query.from_user.id, text=msg, reply_markup=ADM_FINANCE_KB, parse_mode="Markdown")
         
     elif data == "adm_apps":
         config = get_config()
         apps_list = "\n".join([f"- {a['name']} ({a.get('limit','N/A')})" for a in config['monitored_apps']]) if config['monitored_apps'] else "No apps."
         msg = f"📱 **Apps:**\n{apps_list}"
-        kb = [
-            [InlineKeyboardButton("➕ Add App", callback_data="add_app"), InlineKeyboardButton("➖ Remove App", callback_data="rmv_app")],
-            [InlineKeyboardButton("✏️ Edit Limit", callback_data="edit_app_limit_start")],
-            [InlineKeyboardButton("🔙 Admin Home", callback_data="admin_panel")]
-        ]
-        await query.edit_message_text(msg, reply_markup=InlineKeyboardMarkup(kb))
+        await query.edit_message_text(msg, reply_markup=ADM_APPS_KB)
         
     elif data == "adm_content":
-        kb = [
-            [InlineKeyboardButton("⏰ Start Time", callback_data="set_time_start"), InlineKeyboardButton("⏰ End Time", callback_data="set_time_end")],
-            [InlineKeyboardButton("🔘 Button Config", callback_data="ed_btns")],
-            [InlineKeyboardButton("➕ Add Custom Btn", callback_data="add_cus_btn"), InlineKeyboardButton("➖ Rmv Custom Btn", callback_data="rmv_cus_btn")],
-            [InlineKeyboardButton("🔙 Admin Home", callback_data="admin_panel")]
-        ]
-        await query.edit_message_text("🎨 **Settings**", reply_markup=InlineKeyboardMarkup(kb))
+        await query.edit_message_text("🎨 **Settings**", reply_markup=ADM_CONTENT_KB)
 
     elif data == "adm_admins":
-        kb = [[InlineKeyboardButton("➕ Add Admin", callback_data="add_new_admin")], [InlineKeyboardButton("➖ Remove Admin", callback_data="rmv_admin_role")], [InlineKeyboardButton("🔙 Back", callback_data="admin_panel")]]
-        await query.edit_message_text("👮 **Admins**", reply_markup=InlineKeyboardMarkup(kb))
+        await query.edit_message_text("👮 **Admins**", reply_markup=ADM_ADMINS_KB)
         
     elif data == "adm_log":
         curr = get_config().get('log_channel_id', 'N/A')
-        kb = [[InlineKeyboardButton("✏️ Set Channel ID", callback_data="set_log_id")], [InlineKeyboardButton("🔙 Back", callback_data="admin_panel")]]
-        await query.edit_message_text(f"📢 Log ID: `{curr}`", parse_mode="Markdown", reply_markup=InlineKeyboardMarkup(kb))
+        await query.edit_message_text(f"📢 Log ID: `{curr}`", parse_mode="Markdown", reply_markup=ADM_LOG_KB)
 
 # --- Admin Function Implementations (Add/Edit) ---
 
@@ -1057,33 +1468,48 @@ async def add_app_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
     return ADD_APP_LIMIT
 
 async def add_app_limit(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        limit = int(update.message.text.strip())
-        config = get_config()
-        apps = config.get('monitored_apps', [])
-        apps.append({"id": context.user_data['nid'], "name": context.user_data['nname'], "limit": limit})
-        update_config({"monitored_apps": apps})
-        await update.message.reply_text("✅ App Added!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
-        return ConversationHandler.END
-    except: return ADD_APP_LIMIT
+    text = update.message.text.strip()
+    if not text.isdecimal():
+        await update.message.reply_text("❌ Limit must be a whole number. Try again:")
+        return ADD_APP_LIMIT
+
+    new_app = {"id": context.user_data['nid'], "name": context.user_data['nname'], "limit": int(text)}
+    # পুরো লিস্ট আবার না লিখে শুধু নতুন অ্যাপটি যোগ (অন্য এডমিনের পরিবর্তন হারায় না)
+    await asyncio.to_thread(update_config_array, "monitored_apps", firestore.ArrayUnion([new_app]))
+    await update.message.reply_text("✅ App Added!", reply_markup=BACK_ADMIN_KB)
+    return ConversationHandler.END
 
 async def rmv_app_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     apps = get_config().get('monitored_apps', [])
     if not apps:
         await update.callback_query.answer("No apps", show_alert=True)
         return ConversationHandler.END
-    btns = [[InlineKeyboardButton(f"🗑️ {a['name']}", callback_data=f"rm_{i}")] for i, a in enumerate(apps)]
+    btns = [[InlineKeyboardButton(f"🗑️ {a['name']}", callback_data=f"rm_{a['id']}")] for a in apps]
     await update.callback_query.edit_message_text("Select to Remove:", reply_markup=InlineKeyboardMarkup(btns))
     return REMOVE_APP_SELECT
 
+@firestore.transactional
+def _remove_app_tx(transaction, ref, app_id):
+    """সর্বশেষ লিস্ট পড়ে আইডি দিয়ে অ্যাপ বাদ (ArrayRemove পুরো ডিক্ট মেলায়, limit বদলে গেলে কিছুই মুছত না)"""
+    apps = (ref.get(transaction=transaction).to_dict() or {}).get('monitored_apps', [])
+    kept = [a for a in apps if a.get('id') != app_id]
+    if len(kept) == len(apps): return False
+    transaction.update(ref, {"monitored_apps": kept})
+    return True
+
 async def rmv_app_sel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    idx = int(update.callback_query.data.split("rm_")[1])
-    config = get_config()
-    apps = config.get('monitored_apps', [])
-    if 0 <= idx < len(apps):
-        del apps[idx]
-        update_config({"monitored_apps": apps})
-        await update.callback_query.edit_message_text("✅ Removed!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
+    # ইনডেক্স নয়, অ্যাপ আইডি দিয়ে (মাঝে লিস্ট বদলালেও ভুল অ্যাপ মুছবে না)
+    app_id = update.callback_query.data[len("rm_"):]
+    try:
+        removed = await asyncio.to_thread(_remove_app_tx, db.transaction(), db.collection('settings').document('main_config'), app_id)
+    except Exception as e:
+        logger.error(f"Config Update Error: {e}")
+        removed = False
+    invalidate_config()
+    if removed:
+        await update.callback_query.edit_message_text("✅ Removed!", reply_markup=BACK_ADMIN_KB)
+    else:
+        await update.callback_query.edit_message_text("❌ App not found or remove failed.", reply_markup=BACK_ADMIN_KB)
     return ConversationHandler.END
 
 async def find_user_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1092,7 +1518,7 @@ async def find_user_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def find_user_result(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.message.text.strip()
-    user = get_user(uid)
+    user = await asyncio.to_thread(get_user, uid, fields=['name', 'balance', 'referral_count', 'is_blocked'])
     if not user:
         await update.message.reply_text("User Not Found.")
         return ConversationHandler.END
@@ -1110,15 +1536,20 @@ async def find_user_result(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(msg, reply_markup=InlineKeyboardMarkup(kb))
     return ADMIN_USER_ACTION
 
+@firestore.transactional
+def _toggle_block_tx(transaction, user_ref):
+    snap = user_ref.get(field_paths=['is_blocked'], transaction=transaction)
+    transaction.update(user_ref, {"is_blocked": not (snap.to_dict() or {}).get('is_blocked', False)})
+
 async def user_action_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     data = update.callback_query.data
     uid = context.user_data['mng_uid']
     if data == "cancel": return await cancel_conv(update, context)
     
     if data == "u_toggle_block":
-        user = get_user(uid)
-        db.collection('users').document(uid).update({"is_blocked": not user.get('is_blocked', False)})
-        await update.callback_query.edit_message_text("✅ Status Changed!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
+        # রিড + উল্টো মান লেখা একটি ট্রানজ্যাকশনে (লুপ ব্লক না করে থ্রেডে)
+        await asyncio.to_thread(_toggle_block_tx, db.transaction(), db.collection('users').document(uid))
+        await update.callback_query.edit_message_text("✅ Status Changed!", reply_markup=BACK_ADMIN_KB)
         return ConversationHandler.END
     elif "bal" in data:
         context.user_data['bal_action'] = "add" if "add" in data else "cut"
@@ -1127,12 +1558,21 @@ async def user_action_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def user_balance_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        amt = float(update.message.text)
-        uid = context.user_data['mng_uid']
-        val = amt if context.user_data['bal_action'] == "add" else -amt
-        db.collection('users').document(uid).update({"balance": firestore.Increment(val)})
-        await update.message.reply_text("✅ Balance Updated!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
-    except: pass
+        amt = float(update.message.text.strip())
+    except ValueError:
+        amt = 0.0
+    if not 0 < amt < float('inf'):
+        await update.message.reply_text("❌ Invalid amount.", reply_markup=BACK_ADMIN_KB)
+        return ConversationHandler.END
+
+    uid = context.user_data['mng_uid']
+    val = amt if context.user_data['bal_action'] == "add" else -amt
+    try:
+        await asyncio.to_thread(db.collection('users').document(uid).update, {"balance": firestore.Increment(val)})
+        await update.message.reply_text("✅ Balance Updated!", reply_markup=BACK_ADMIN_KB)
+    except Exception as e:
+        logger.error(f"Balance Update Error: {e}")
+        await update.message.reply_text("❌ Update failed.", reply_markup=BACK_ADMIN_KB)
     return ConversationHandler.END
 
 # Text Editing (Referral, Time etc)
@@ -1145,25 +1585,55 @@ async def edit_text_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def edit_text_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
     val = update.message.text.strip()
     key = context.user_data['edit_key']
-    if key == "referral_bonus": val = float(val)
-    update_config({key: val})
-    await update.message.reply_text("✅ Saved!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
+    if key == "referral_bonus":
+        try:
+            val = float(val)
+        except ValueError:
+            await update.message.reply_text("❌ Invalid number.", reply_markup=BACK_ADMIN_KB)
+            return ConversationHandler.END
+    await asyncio.to_thread(update_config, {key: val})
+    await update.message.reply_text("✅ Saved!", reply_markup=BACK_ADMIN_KB)
     return ConversationHandler.END
 
 # Button Editing
+# বাটন মেনুর নির্দিষ্ট ক্রম (Firestore ম্যাপের কী-ক্রমের উপর নির্ভর না করে)
+BTN_ORDER = ('submit', 'profile', 'withdraw', 'refer', 'schedule')
+
 async def edit_buttons_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    btns = get_config().get('buttons', DEFAULT_CONFIG['buttons'])
-    kb = []
-    for k, v in btns.items():
-        kb.append([InlineKeyboardButton(f"{'✅' if v['show'] else '❌'} {v['text']}", callback_data=f"btntog_{k}")])
-    kb.append([InlineKeyboardButton("🔙 Back", callback_data="adm_content")])
-    await update.callback_query.edit_message_text("Toggle Buttons:", reply_markup=InlineKeyboardMarkup(kb))
+    config = get_config()
+    # টগলের পর কনফিগ নতুন অবজেক্ট হয়, তাই এই ক্যাশ নিজে থেকেই বাতিল হয়
+    kb = config.get('_btn_menu_kb')
+    if kb is None:
+        btns = config.get('buttons', DEFAULT_CONFIG['buttons'])
+        rows = [[InlineKeyboardButton(f"{'✅' if btns[k]['show'] else '❌'} {btns[k]['text']}", callback_data=f"btntog_{k}")]
+                for k in BTN_ORDER if k in btns]
+        rows.append([InlineKeyboardButton("🔙 Back", callback_data="adm_content")])
+        kb = config['_btn_menu_kb'] = InlineKeyboardMarkup(rows)
+    await update.callback_query.edit_message_text("Toggle Buttons:", reply_markup=kb)
+
+@firestore.transactional
+def _toggle_button_tx(transaction, ref, key):
+    """একটি বাটনের show উল্টানো; শুধু buttons.<key>.show ফিল্ড লেখা হয় (পুরো buttons ম্যাপ নয়)"""
+    snap = ref.get(transaction=transaction)
+    stored = (snap.to_dict() or {}).get('buttons') if snap.exists else None
+    if stored and key in stored:
+        stored[key]['show'] = not stored[key].get('show', True)
+        transaction.update(ref, {f"buttons.{key}.show": stored[key]['show']})
+    else:
+        # ডকুমেন্টে buttons নেই (শুধু ডিফল্ট) হলে পুরো ম্যাপ একবার লেখা হয়
+        stored = {k: dict(v) for k, v in get_config().get('buttons', DEFAULT_CONFIG['buttons']).items()}
+        stored[key]['show'] = not stored[key]['show']
+        transaction.set(ref, {'buttons': stored}, merge=True)
+    return stored
 
 async def button_action_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     key = update.callback_query.data.split("_")[1]
-    config = get_config()
-    config['buttons'][key]['show'] = not config['buttons'][key]['show']
-    update_config({"buttons": config['buttons']})
+    if key not in get_config().get('buttons', {}): return
+    try:
+        buttons = await asyncio.to_thread(_toggle_button_tx, db.transaction(), db.collection('settings').document('main_config'), key)
+        _merge_cached_config({"buttons": buttons})
+    except Exception as e:
+        logger.error(f"Config Update Error: {e}")
     await edit_buttons_menu(update, context)
 
 # Admin Management
@@ -1173,8 +1643,9 @@ async def add_admin_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def add_admin_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.message.text.strip()
-    db.collection('users').document(uid).set({"is_admin": True}, merge=True)
-    await update.message.reply_text("✅ Admin Added!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
+    await asyncio.to_thread(db.collection('users').document(uid).set, {"is_admin": True}, merge=True)
+    set_admin_flag(uid, True)
+    await update.message.reply_text("✅ Admin Added!", reply_markup=BACK_ADMIN_KB)
     return ConversationHandler.END
 
 async def rmv_admin_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1184,31 +1655,43 @@ async def rmv_admin_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def rmv_admin_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
     uid = update.message.text.strip()
     if uid == OWNER_ID: return
-    db.collection('users').document(uid).update({"is_admin": False})
-    await update.message.reply_text("✅ Admin Removed!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
+    await asyncio.to_thread(db.collection('users').document(uid).update, {"is_admin": False})
+    set_admin_flag(uid, False)
+    await update.message.reply_text("✅ Admin Removed!", reply_markup=BACK_ADMIN_KB)
     return ConversationHandler.END
 
 async def edit_app_limit_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     apps = get_config().get('monitored_apps', [])
     if not apps: return ConversationHandler.END
-    btns = [[InlineKeyboardButton(f"{a['name']}", callback_data=f"edlim_{i}")] for i, a in enumerate(apps)]
+    btns = [[InlineKeyboardButton(f"{a['name']}", callback_data=f"edlim_{a['id']}")] for a in apps]
     await update.callback_query.edit_message_text("Select App:", reply_markup=InlineKeyboardMarkup(btns))
     return EDIT_APP_SELECT
 
 async def edit_app_limit_select(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data['ed_app_idx'] = int(update.callback_query.data.split("_")[1])
+    context.user_data['ed_app_id'] = update.callback_query.data[len("edlim_"):]
     await update.callback_query.edit_message_text("Enter New Limit:")
     return EDIT_APP_LIMIT_VAL
 
+@firestore.transactional
+def _set_app_limit_tx(transaction, ref, app_id, limit):
+    """সর্বশেষ লিস্ট পড়ে শুধু ঐ অ্যাপের limit বদলানো (লিস্ট স্কিমা ওয়েব অ্যাপও পড়ে, তাই ম্যাপ নয়)"""
+    apps = (ref.get(transaction=transaction).to_dict() or {}).get('monitored_apps', [])
+    apps = [dict(a, limit=limit) if a.get('id') == app_id else a for a in apps]
+    transaction.update(ref, {"monitored_apps": apps})
+
 async def edit_app_limit_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    app_id = context.user_data['ed_app_id']
+    if not text.isdecimal() or app_id not in get_config()['_apps_by_id']:
+        await update.message.reply_text("❌ Invalid limit.", reply_markup=BACK_ADMIN_KB)
+        return ConversationHandler.END
+
     try:
-        limit = int(update.message.text)
-        idx = context.user_data['ed_app_idx']
-        config = get_config()
-        config['monitored_apps'][idx]['limit'] = limit
-        update_config({"monitored_apps": config['monitored_apps']})
-        await update.message.reply_text("✅ Limit Updated!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
-    except: pass
+        await asyncio.to_thread(_set_app_limit_tx, db.transaction(), db.collection('settings').document('main_config'), app_id, int(text))
+        await update.message.reply_text("✅ Limit Updated!", reply_markup=BACK_ADMIN_KB)
+    except Exception as e:
+        logger.error(f"Config Update Error: {e}")
+    invalidate_config()
     return ConversationHandler.END
 
 async def add_custom_btn_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1219,11 +1702,11 @@ async def add_custom_btn_link(update: Update, context: ContextTypes.DEFAULT_TYPE
     await update.message.reply_text("Button URL:")
     return ADMIN_ADD_BTN_LINK
 async def add_custom_btn_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    config = get_config()
-    btns = config.get('custom_buttons', [])
+    # ক্যাশের লিস্ট (বা DEFAULT_CONFIG এর লিস্ট) সরাসরি বদলানো নয়; লেখা ব্যর্থ হলে ক্যাশে ভুল বাটন থেকে যেত
+    btns = list(get_config().get('custom_buttons', []))
     btns.append({"text": context.user_data['c_btn_name'], "url": update.message.text})
-    update_config({"custom_buttons": btns})
-    await update.message.reply_text("✅ Button Added!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
+    await asyncio.to_thread(update_config, {"custom_buttons": btns})
+    await update.message.reply_text("✅ Button Added!", reply_markup=BACK_ADMIN_KB)
     return ConversationHandler.END
 
 async def rmv_custom_btn_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1235,12 +1718,11 @@ async def rmv_custom_btn_start(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def rmv_custom_btn_handle(update: Update, context: ContextTypes.DEFAULT_TYPE):
     idx = int(update.callback_query.data.split("_")[4])
-    config = get_config()
-    btns = config.get('custom_buttons', [])
+    btns = list(get_config().get('custom_buttons', []))
     if 0 <= idx < len(btns):
         del btns[idx]
-        update_config({"custom_buttons": btns})
-    await update.callback_query.edit_message_text("✅ Removed!", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin", callback_data="admin_panel")]]))
+        await asyncio.to_thread(update_config, {"custom_buttons": btns})
+    await update.callback_query.edit_message_text("✅ Removed!", reply_markup=BACK_ADMIN_KB)
     return ConversationHandler.END
 
 
@@ -1248,50 +1730,127 @@ async def rmv_custom_btn_handle(update: Update, context: ContextTypes.DEFAULT_TY
 # 7. মেইন রানার
 # ==========================================
 
-app = Flask(__name__)
-@app.route('/')
-def home(): return "Bot is Alive & Secure!"
+_HEALTH_BODY = "Bot is Alive & Secure!".encode('utf-8')
+_HEALTH_RESPONSE = (
+    b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; charset=utf-8\r\n"
+    b"Content-Length: " + str(len(_HEALTH_BODY)).encode() + b"\r\nConnection: close\r\n\r\n" + _HEALTH_BODY
+)
 
-def run_flask():
-    app.run(host='0.0.0.0', port=PORT)
+async def home(reader, writer):
+    """হেলথ-চেকের জন্য যেকোনো রিকোয়েস্টে একই 200 উত্তর (কোনো ওয়েব ফ্রেমওয়ার্ক লাগে না)"""
+    try:
+        await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+        writer.write(_HEALTH_RESPONSE)
+        await writer.drain()
+    except Exception: pass
+    finally:
+        writer.close()
+
+async def start_web_server():
+    """হেলথ-চেক সার্ভার বটের নিজের asyncio লুপেই চলে (আলাদা থ্রেড লাগে না)"""
+    return await asyncio.start_server(home, '0.0.0.0', PORT)
+
+async def post_init(application):
+    global BOT_APP, BOT_LOOP, LOG_QUEUE
+    BOT_APP = application
+    BOT_LOOP = asyncio.get_running_loop()
+    LOG_QUEUE = asyncio.Queue(maxsize=LOG_QUEUE_MAX)
+    application.bot_data['log_worker'] = asyncio.create_task(log_worker(application.bot))
+    # async হ্যান্ডলারগুলোর (ImgBB আপলোড) জন্য একটি শেয়ার্ড HTTP ক্লায়েন্ট
+    application.bot_data['http'] = httpx.AsyncClient(
+        timeout=30,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        transport=httpx.AsyncHTTPTransport(retries=1)
+    )
+    application.bot_data['web_server'] = await start_web_server()
+    # পোলিং শুরুর আগেই একটি রিড: gRPC চ্যানেল + অথ টোকেন তৈরি হয়ে থাকে আর কনফিগ ক্যাশও ভরে যায়,
+    # তাই প্রথম ইউজারের /start এ কোল্ড-কানেকশনের দেরি হয় না (একটি db ক্লায়েন্টই থ্রেড-সেফ, সবাই সেটাই ব্যবহার করে)
+    await asyncio.to_thread(get_config)
+    application.bot_data['admin_watch'] = watch_admins()
+    if application.bot_data['admin_watch'] is None:
+        # লিসেনার নেই: প্রতি মিনিটে এডমিন সেট রিফ্রেশ
+        application.job_queue.run_repeating(admins_job, interval=60, first=0)
+    application.bot_data['config_watch'] = watch_config()
+    # লুপ তৈরি হওয়ার পর অটোমেশন শুরু, যাতে শুরুর মেসেজগুলো হারিয়ে না যায়
+    jq = application.job_queue
+    jq.run_once(backfill_job, when=0)
+    jq.run_repeating(submissions_job, interval=10, first=5)
+    jq.run_repeating(reviews_job, interval=300, first=300)
+
+async def post_stop(application):
+    # বট বন্ধ হওয়ার আগে বাকি লগগুলো পাঠানোর জন্য কয়েক সেকেন্ড সময়
+    worker = application.bot_data.pop('log_worker', None)
+    if worker:
+        try: await asyncio.wait_for(LOG_QUEUE.join(), timeout=5)
+        except asyncio.TimeoutError: pass
+        worker.cancel()
+
+async def post_shutdown(application):
+    client = application.bot_data.pop('http', None)
+    if client: await client.aclose()
+    server = application.bot_data.pop('web_server', None)
+    if server:
+        server.close()
+        await server.wait_closed()
+    for key in ('admin_watch', 'config_watch'):
+        watch = application.bot_data.pop(key, None)
+        if watch: watch.unsubscribe()
+
+# --- Callback Routing ---
+# সঠিক callback_data -> হ্যান্ডলার (O(1) লুকআপ)
+CALLBACK_ROUTES = {
+    "admin_panel": admin_panel,
+    "adm_users": admin_sub_handlers, "adm_finance": admin_sub_handlers, "adm_apps": admin_sub_handlers,
+    "adm_content": admin_sub_handlers, "adm_admins": admin_sub_handlers, "adm_log": admin_sub_handlers,
+    "adm_reports": admin_reports_menu,
+    "adm_daily_stats": admin_daily_stats, # [NEW] Daily Stats Handler
+    "ed_btns": edit_buttons_menu,
+}
+# আইডি সহ callback_data (prefix দিয়ে মেলানো)
+PREFIX_ROUTES = (
+    ("rep_select_app_", admin_report_timeframe),
+    ("rep_gen_", export_report_data),
+    ("btntog_", button_action_handler),
+    ("wd_apr_", handle_withdrawal_action), ("wd_rej_", handle_withdrawal_action),
+    ("t_apr_", handle_task_action), ("t_rej_", handle_task_action),
+)
 
-def main():
-    threading.Thread(target=run_flask, daemon=True).start()
-    threading.Thread(target=run_automation, daemon=True).start()
+def _find_route(data):
+    handler = CALLBACK_ROUTES.get(data)
+    if handler: return handler
+    for prefix, handler in PREFIX_ROUTES:
+        if data.startswith(prefix): return handler
+    return None
+
+def has_callback_route(data):
+    return isinstance(data, str) and _find_route(data) is not None
+
+async def route_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    return await _find_route(update.callback_query.data)(update, context)
 
-    application = ApplicationBuilder().token(TOKEN).build()
+def main():
+    # সব আউটগোয়িং কল (অটোমেশন + হ্যান্ডলার) একটি লিমিটারের মধ্য দিয়ে: বট-ওয়াইড ২৯/সেকেন্ড, গ্রুপ/চ্যানেলে ২০/মিনিট,
+    # Telegram RetryAfter দিলে অপেক্ষা করে একবার আবার চেষ্টা
+    rate_limiter = AIORateLimiter(overall_max_rate=29, overall_time_period=1, max_retries=1)
+    application = (ApplicationBuilder().token(TOKEN).rate_limiter(rate_limiter)
+                   .post_init(post_init).post_stop(post_stop).post_shutdown(post_shutdown).build())
 
     # Commands
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("login", generate_login_pass)) # লগইন কোড জেনারেটর
 
-    # Callbacks
-    application.add_handler(CallbackQueryHandler(admin_panel, pattern="^admin_panel$"))
-    application.add_handler(CallbackQueryHandler(admin_sub_handlers, pattern="^(adm_users|adm_finance|adm_apps|adm_content|adm_admins|adm_log)$"))
-    
-    # --- UPDATED REPORT HANDLERS ---
-    application.add_handler(CallbackQueryHandler(admin_reports_menu, pattern="^adm_reports$"))
-    application.add_handler(CallbackQueryHandler(admin_report_timeframe, pattern="^rep_select_app_"))
-    application.add_handler(CallbackQueryHandler(export_report_data, pattern="^rep_gen_"))
-    # [NEW] Daily Stats Handler
-    application.add_handler(CallbackQueryHandler(admin_daily_stats, pattern="^adm_daily_stats$"))
-    # -------------------------------
-
-    application.add_handler(CallbackQueryHandler(edit_buttons_menu, pattern="^ed_btns$"))
-    application.add_handler(CallbackQueryHandler(button_action_handler, pattern="^btntog_"))
-    
-    application.add_handler(CallbackQueryHandler(handle_withdrawal_action, pattern="^wd_(apr|rej)_"))
-    application.add_handler(CallbackQueryHandler(handle_task_action, pattern="^t_(apr|rej)_"))
+    # Callbacks (সব সাধারণ বাটন একটি হ্যান্ডলারে, টেবিল দেখে রাউট হয়)
+    application.add_handler(CallbackQueryHandler(route_callback, pattern=has_callback_route))
 
     # Conversations
     application.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(start_task_submission, pattern="^submit_task$")],
         states={
             T_APP_SELECT: [CallbackQueryHandler(app_selected, pattern="^sel_")],
-            T_REVIEW_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_review_name)],
-            T_EMAIL: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_email)],
-            T_DEVICE: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_device)],
-            T_SS: [MessageHandler((filters.TEXT | filters.PHOTO) & ~filters.COMMAND, save_task)]
+            T_REVIEW_NAME: [MessageHandler(TEXT_NC, get_review_name)],
+            T_EMAIL: [MessageHandler(TEXT_NC, get_email)],
+            T_DEVICE: [MessageHandler(TEXT_NC, get_device)],
+            T_SS: [MessageHandler(TEXT_PHOTO_NC, save_task)]
         },
         fallbacks=[CallbackQueryHandler(cancel_conv, pattern="^cancel")]
     ))
@@ -1300,21 +1859,21 @@ def main():
         entry_points=[CallbackQueryHandler(withdraw_start, pattern="^start_withdraw$")],
         states={
             WD_METHOD: [CallbackQueryHandler(withdraw_method, pattern="^m_(bkash|nagad)$|^cancel$")],
-            WD_NUMBER: [MessageHandler(filters.TEXT & ~filters.COMMAND, withdraw_number)],
-            WD_AMOUNT: [MessageHandler(filters.TEXT & ~filters.COMMAND, withdraw_amount)]
+            WD_NUMBER: [MessageHandler(TEXT_NC, withdraw_number)],
+            WD_AMOUNT: [MessageHandler(TEXT_NC, withdraw_amount)]
         },
         fallbacks=[CallbackQueryHandler(cancel_conv, pattern="^cancel")]
     ))
     
     application.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(add_app_start, pattern="^add_app$")],
-        states={ADD_APP_ID: [MessageHandler(filters.TEXT, add_app_id)], ADD_APP_NAME: [MessageHandler(filters.TEXT, add_app_name)], ADD_APP_LIMIT: [MessageHandler(filters.TEXT, add_app_limit)]},
+        states={ADD_APP_ID: [MessageHandler(TEXT_NC, add_app_id)], ADD_APP_NAME: [MessageHandler(TEXT_NC, add_app_name)], ADD_APP_LIMIT: [MessageHandler(TEXT_NC, add_app_limit)]},
         fallbacks=[CallbackQueryHandler(cancel_conv)]
     ))
     
     application.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(edit_app_limit_start, pattern="^edit_app_limit_start$")],
-        states={EDIT_APP_SELECT: [CallbackQueryHandler(edit_app_limit_select)], EDIT_APP_LIMIT_VAL: [MessageHandler(filters.TEXT, edit_app_limit_save)]},
+        states={EDIT_APP_SELECT: [CallbackQueryHandler(edit_app_limit_select)], EDIT_APP_LIMIT_VAL: [MessageHandler(TEXT_NC, edit_app_limit_save)]},
         fallbacks=[CallbackQueryHandler(cancel_conv)]
     ))
 
@@ -1326,19 +1885,19 @@ def main():
     
     application.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(find_user_start, pattern="^find_user$")],
-        states={ADMIN_USER_SEARCH: [MessageHandler(filters.TEXT, find_user_result)], ADMIN_USER_ACTION: [CallbackQueryHandler(user_action_handler)], ADMIN_USER_AMOUNT: [MessageHandler(filters.TEXT, user_balance_update)]},
+        states={ADMIN_USER_SEARCH: [MessageHandler(TEXT_NC, find_user_result)], ADMIN_USER_ACTION: [CallbackQueryHandler(user_action_handler)], ADMIN_USER_AMOUNT: [MessageHandler(TEXT_NC, user_balance_update)]},
         fallbacks=[CallbackQueryHandler(cancel_conv)]
     ))
     
     application.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(edit_text_start, pattern="^(ed_txt_referral_bonus|set_log_id|set_time_start|set_time_end)$")],
-        states={ADMIN_EDIT_TEXT_VAL: [MessageHandler(filters.TEXT, edit_text_save)]},
+        states={ADMIN_EDIT_TEXT_VAL: [MessageHandler(TEXT_NC, edit_text_save)]},
         fallbacks=[CallbackQueryHandler(cancel_conv)]
     ))
     
     application.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(add_custom_btn_start, pattern="^add_cus_btn$")],
-        states={ADMIN_ADD_BTN_NAME: [MessageHandler(filters.TEXT, add_custom_btn_link)], ADMIN_ADD_BTN_LINK: [MessageHandler(filters.TEXT, add_custom_btn_save)]},
+        states={ADMIN_ADD_BTN_NAME: [MessageHandler(TEXT_NC, add_custom_btn_link)], ADMIN_ADD_BTN_LINK: [MessageHandler(TEXT_NC, add_custom_btn_save)]},
         fallbacks=[CallbackQueryHandler(cancel_conv)]
     ))
 
@@ -1350,19 +1909,19 @@ def main():
 
     application.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(add_admin_start, pattern="^add_new_admin$")],
-        states={ADMIN_ADD_ADMIN_ID: [MessageHandler(filters.TEXT, add_admin_save)]},
+        states={ADMIN_ADD_ADMIN_ID: [MessageHandler(TEXT_NC, add_admin_save)]},
         fallbacks=[CallbackQueryHandler(cancel_conv)]
     ))
     
     application.add_handler(ConversationHandler(
         entry_points=[CallbackQueryHandler(rmv_admin_start, pattern="^rmv_admin_role$")],
-        states={ADMIN_RMV_ADMIN_ID: [MessageHandler(filters.TEXT, rmv_admin_save)]},
+        states={ADMIN_RMV_ADMIN_ID: [MessageHandler(TEXT_NC, rmv_admin_save)]},
         fallbacks=[CallbackQueryHandler(cancel_conv)]
     ))
 
     application.add_handler(CallbackQueryHandler(common_callback, pattern="^(my_profile|refer_friend|back_home|show_schedule)$"))
 
-    print("🚀 Bot Started on Render...")
+    logger.info("🚀 Bot Started on Render...")
     application.run_polling(drop_pending_updates=True)
 
 if __name__ == '__main__':